@@ -0,0 +1,91 @@
+from concurrent.futures import Future
+from functools import partial
+import logging
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .metrics import metrics
+from .renderers import RENDERERS_BY_FORMAT
+from recipes.executors import submit
+
+EXPORT_DONE = 'done'
+EXPORT_FAILED = 'failed'
+EXPORT_JOB_KEY = 'shopping_list_export:{}'
+EXPORT_LOG_MESSAGE = (
+    'Список покупок {} ({}): статус {}, ожидание {:.3f} с, '
+    'формирование {:.3f} с.'
+)
+EXPORT_PENDING = 'pending'
+
+logger = logging.getLogger(__name__)
+
+
+def render_shopping_list(format, ingredients):
+    started = time.perf_counter()
+    content = b''.join(RENDERERS_BY_FORMAT[format]().export(ingredients))
+    return content, time.perf_counter() - started
+
+
+def finish_export(job_id, job, future):
+    try:
+        content, render_time = future.result()
+    except Exception:
+        logger.exception(EXPORT_LOG_MESSAGE.format(
+            job_id, job['format'], EXPORT_FAILED, 0, 0
+        ))
+        job.update(status=EXPORT_FAILED)
+    else:
+        cache.set(job['key'], content, settings.SHOPPING_LIST_CACHE_TIMEOUT)
+        metrics.observe(
+            'foodgram_shopping_list_render_seconds', render_time,
+            format=job['format']
+        )
+        job.update(
+            status=EXPORT_DONE,
+            render_time=render_time,
+            wait_time=time.time() - job['queued_at'] - render_time
+        )
+        logger.info(EXPORT_LOG_MESSAGE.format(
+            job_id, job['format'], EXPORT_DONE, job['wait_time'], render_time
+        ))
+    cache.set(
+        EXPORT_JOB_KEY.format(job_id), job,
+        settings.SHOPPING_LIST_CACHE_TIMEOUT
+    )
+
+
+def start_export(user, format, key, ingredients):
+    job_id = uuid.uuid4().hex
+    job = dict(
+        user=user.id, format=format, key=key, status=EXPORT_PENDING,
+        queued_at=time.time(), wait_time=None, render_time=None
+    )
+    if cache.get(key) is not None:
+        job.update(status=EXPORT_DONE, wait_time=0, render_time=0)
+    cache.set(
+        EXPORT_JOB_KEY.format(job_id), job,
+        settings.SHOPPING_LIST_CACHE_TIMEOUT
+    )
+    if job['status'] != EXPORT_PENDING:
+        return job_id
+    try:
+        future = submit(
+            __name__, settings.SHOPPING_LIST_EXPORT_EXECUTOR,
+            settings.SHOPPING_LIST_EXPORT_WORKERS,
+            render_shopping_list, format, ingredients
+        )
+    except Exception as error:
+        future = Future()
+        future.set_exception(error)
+    future.add_done_callback(partial(finish_export, job_id, dict(job)))
+    return job_id
+
+
+def get_export(job_id, user):
+    job = cache.get(EXPORT_JOB_KEY.format(job_id))
+    if job is None or job['user'] != user.id:
+        return None
+    return job
@@ -1,31 +1,104 @@
 from base64 import b64decode
 import binascii
+from io import BytesIO
+import os
 import re
+from urllib.parse import urlparse
 
-from django.core.files.uploadedfile import SimpleUploadedFile
+from django.conf import settings
+from django.core.files.uploadedfile import (
+    InMemoryUploadedFile, TemporaryUploadedFile
+)
+from PIL import Image
+from rest_framework.exceptions import ValidationError
 from rest_framework.fields import ImageField as RestFrameworkImageField
+from rest_framework.fields import Field, IntegerField, ListField
 from rest_framework.settings import api_settings
 
+from recipes.images import get_variant_formats, get_variant_name
+
+BASE64_CHUNK_SIZE = 64 * 1024
+DATA_URI_HEADER = re.compile(
+    r'data:(?P<content_type>image/(?P<extension>[a-z]+));base64,'
+)
+DOES_NOT_EXIST_ERROR = 'Не найдены {} с id {}.'
+
+
+def get_in_bulk(queryset, ids):
+    objects = queryset.in_bulk(set(ids))
+    missing = [str(id) for id in dict.fromkeys(ids) if id not in objects]
+    if missing:
+        raise ValidationError(DOES_NOT_EXIST_ERROR.format(
+            queryset.model._meta.verbose_name_plural, ', '.join(missing)
+        ))
+    return objects
+
 
 class ImageField(RestFrameworkImageField):
+    default_error_messages = {
+        'max_size': 'Размер изображения не должен превышать {max_size} байт.',
+        'max_pixels': (
+            'Изображение не должно содержать больше {max_pixels} пикселей.'
+        ),
+    }
+
+    def decode(self, data, start, size, content_type, name):
+        if size > settings.FILE_UPLOAD_MAX_MEMORY_SIZE:
+            upload = TemporaryUploadedFile(name, content_type, size, None)
+        else:
+            upload = InMemoryUploadedFile(
+                BytesIO(), None, name, content_type, size, None
+            )
+        for position in range(start, len(data), BASE64_CHUNK_SIZE):
+            try:
+                upload.file.write(b64decode(
+                    data[position:position + BASE64_CHUNK_SIZE],
+                    validate=True
+                ))
+            except binascii.Error:
+                self.fail('invalid')
+        upload.file.seek(0)
+        return upload
+
+    def get_current_image(self, data):
+        instance = getattr(self.parent, 'instance', None)
+        if instance is None or not isinstance(data, str):
+            return None
+        image = getattr(instance, self.source, None)
+        if not image:
+            return None
+        digest = os.path.splitext(os.path.basename(image.name))[0]
+        if data in (image.name, digest) or urlparse(data).path == image.url:
+            return image
+        return None
+
     def to_internal_value(self, data):
-        match = re.match(
-            (
-                r'^data:(?P<content_type>image\/(?P<extension>[a-z]+));'
-                r'base64,(?P<content>[A-Za-z0-9+\/]+.{2})$'
-            ), data
-        )
+        image = self.get_current_image(data)
+        if image is not None:
+            return image
+        match = DATA_URI_HEADER.match(data) if isinstance(data, str) else None
         if not match:
             self.fail('invalid')
-        try:
-            data = SimpleUploadedFile(
-                name=f'image.{match.group("extension")}',
-                content=b64decode(match.group('content')),
-                content_type=match.group('content_type')
-            )
-        except binascii.Error:
+        encoded_size = len(data) - match.end()
+        if not encoded_size or encoded_size % 4:
             self.fail('invalid')
-        return super().to_internal_value(data)
+        size = encoded_size // 4 * 3 - (
+            2 if data.endswith('==') else 1 if data.endswith('=') else 0
+        )
+        if size > settings.IMAGE_MAX_UPLOAD_SIZE:
+            self.fail('max_size', max_size=settings.IMAGE_MAX_UPLOAD_SIZE)
+        upload = self.decode(
+            data, match.end(), size, match.group('content_type'),
+            f'image.{match.group("extension")}'
+        )
+        try:
+            width, height = Image.open(upload.file).size
+        except Exception:
+            self.fail('invalid_image')
+        if width * height > settings.IMAGE_MAX_PIXELS:
+            self.fail('max_pixels', max_pixels=settings.IMAGE_MAX_PIXELS)
+        upload.file.seek(0)
+        return super().to_internal_value(upload)
 
     def to_representation(self, value):
         if not value:
@@ -37,3 +110,40 @@ class ImageField(RestFrameworkImageField):
             except AttributeError:
                 return None
         return value.name
+
+
+class PrimaryKeyListField(ListField):
+    child = IntegerField(min_value=1)
+
+    def __init__(self, queryset, **kwargs):
+        self.queryset = queryset
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        ids = super().to_internal_value(data)
+        objects = get_in_bulk(self.queryset, ids)
+        return [objects[id] for id in ids]
+
+    def to_representation(self, data):
+        return [
+            instance.pk
+            for instance in (data.all() if hasattr(data, 'all') else data)
+        ]
+
+
+class VariantsField(Field):
+    def __init__(self, variants, **kwargs):
+        self.variants = variants
+        kwargs.update(source='*', read_only=True)
+        super().__init__(**kwargs)
+
+    def to_representation(self, recipe):
+        if not recipe.has_image_variants:
+            return None
+        return {
+            variant: {
+                extension: recipe.image.storage.url(
+                    get_variant_name(recipe.image.name, variant, extension)
+                ) for extension in get_variant_formats()
+            } for variant in self.variants
+        }
@@ -1,31 +1,114 @@
+from django import forms
+from django.conf import settings
+from django.db.models import BooleanField, Case, When
 from django_filters import rest_framework as filters
 
-from recipes.models import Ingredient, Recipe
+from recipes.models import Favorite, Ingredient, Recipe, ShoppingCart
+from recipes.search import ingredient_search_index
+
+INGREDIENT_SEARCH_TRIGRAM = 'trigram'
+
+RECIPE_ORDERINGS = {
+    'new': ('-pub_date',),
+    'popular': ('-favorites_count', '-pub_date'),
+    'week': ('-week_favorites_count', '-pub_date'),
+    'trending': ('-trending_score', '-pub_date'),
+}
+
+RELATION_FILTERS = {
+    'is_favorited': Favorite,
+    'is_in_shopping_cart': ShoppingCart,
+}
+
+TAGS_MODE_ALL = 'all'
+TAGS_MODE_ANY = 'any'
+TAGS_MODES = ((TAGS_MODE_ANY, TAGS_MODE_ANY), (TAGS_MODE_ALL, TAGS_MODE_ALL))
+
+
+class MultipleCharField(forms.Field):
+    widget = forms.SelectMultiple
+
+    def to_python(self, value):
+        return [item for item in value or () if item]
+
+
+class MultipleCharFilter(filters.Filter):
+    field_class = MultipleCharField
 
 
 class IngredientFilter(filters.FilterSet):
     name = filters.CharFilter(method='filter_name')
+    limit = filters.NumberFilter(method='filter_limit', min_value=1)
 
     def filter_name(self, queryset, name, value):
-        fitered_queryset = queryset.filter(
-            **{'__'.join((name, 'istartswith')): value}
-        )
-        return fitered_queryset.union(queryset.filter(
-            **{'__'.join((name, 'icontains')): value}
-        ).difference(fitered_queryset).order_by(
-            *queryset.model._meta.ordering
-        ), all=True)
+        limit = self.form.cleaned_data.get('limit')
+        limit = limit and int(limit)
+        if settings.INGREDIENT_SEARCH_BACKEND == INGREDIENT_SEARCH_TRIGRAM:
+            queryset = queryset.filter(
+                **{'__'.join((name, 'icontains')): value}
+            )
+        else:
+            queryset = queryset.filter(
+                id__in=ingredient_search_index.search(value, limit)
+            )
+        return queryset.annotate(is_substring=Case(
+            When(**{'__'.join((name, 'istartswith')): value}, then=False),
+            default=True,
+            output_field=BooleanField()
+        )).order_by('is_substring', *queryset.model._meta.ordering)[:limit]
+
+    def filter_limit(self, queryset, name, value):
+        if self.form.cleaned_data.get('name'):
+            return queryset
+        return queryset[:int(value)]
 
     class Meta:
         model = Ingredient
-        fields = ('name',)
+        fields = ('name', 'limit')
 
 
 class RecipeFilter(filters.FilterSet):
-    is_favorited = filters.BooleanFilter()
-    is_in_shopping_cart = filters.BooleanFilter()
+    is_favorited = filters.BooleanFilter(method='filter_relation')
+    is_in_shopping_cart = filters.BooleanFilter(method='filter_relation')
     author = filters.NumberFilter()
+    tags = MultipleCharFilter(method='filter_tags')
+    tags_mode = filters.ChoiceFilter(
+        choices=TAGS_MODES, method='filter_tags_mode'
+    )
+    ordering = filters.ChoiceFilter(
+        choices=[(ordering, ordering) for ordering in RECIPE_ORDERINGS],
+        method='filter_ordering'
+    )
+
+    def filter_relation(self, queryset, name, value):
+        recipes = RELATION_FILTERS[name].objects.filter(
+            user_id=self.request.user.id
+        ).order_by().values('recipe')
+        if value:
+            return queryset.filter(id__in=recipes)
+        return queryset.exclude(id__in=recipes)
+
+    def filter_tags(self, queryset, name, value):
+        recipes_tags = Recipe.tags.through.objects.values('recipe')
+        if self.form.cleaned_data.get('tags_mode') == TAGS_MODE_ALL:
+            for slug in set(value):
+                queryset = queryset.filter(
+                    id__in=recipes_tags.filter(tag__slug=slug)
+                )
+            return queryset
+        return queryset.filter(
+            id__in=recipes_tags.filter(tag__slug__in=value)
+        )
+
+    def filter_tags_mode(self, queryset, name, value):
+        return queryset
+
+    def filter_ordering(self, queryset, name, value):
+        return queryset.order_by(*RECIPE_ORDERINGS[value])
 
     class Meta:
         model = Recipe
-        fields = ('is_favorited', 'is_in_shopping_cart', 'author')
+        fields = (
+            'is_favorited', 'is_in_shopping_cart', 'author', 'tags',
+            'tags_mode', 'ordering'
+        )
@@ -0,0 +1,219 @@
+import json
+from math import ceil
+import os
+from tempfile import TemporaryDirectory
+import time
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test.utils import (
+    override_settings, setup_test_environment, teardown_test_environment
+)
+from rest_framework.test import APIClient
+
+from recipes.models import Favorite, Recipe, ShoppingCart
+from users.models import User
+
+from ...middleware import QueryStats
+
+BENCHMARK_RESULT_MESSAGE = (
+    '{size:>7} {name:<28} {status} p50 {p50_ms:8.1f} мс, '
+    'p95 {p95_ms:8.1f} мс, запросов {queries:3}, SQL {sql_ms:8.1f} мс'
+)
+BUDGET_EXCEEDED_MESSAGE = '{} ({} рецептов): {} = {} при бюджете {}'
+BAD_STATUS_MESSAGE = '{} ({} рецептов): статус ответа {}'
+BUDGETS_EXCEEDED_ERROR = 'Превышены бюджеты эндпоинтов: {}.'
+BENCHMARK_PREFIX = 'bench'
+BENCHMARK_FAVORITES = 20
+BENCHMARK_CART = 10
+BENCHMARK_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'benchmark',
+    }
+}
+ENDPOINTS = {
+    'recipes': ('/api/recipes/', True),
+    'recipes_anonymous': ('/api/recipes/', False),
+    'recipes_cursor': ('/api/recipes/?pagination=cursor', True),
+    'recipes_popular': ('/api/recipes/?ordering=popular', True),
+    'recipes_favorited': ('/api/recipes/?is_favorited=1', True),
+    'recipe': ('/api/recipes/{recipe}/', True),
+    'users': ('/api/users/', True),
+    'subscriptions': ('/api/users/subscriptions/?recipes_limit=3', True),
+    'ingredients_search': ('/api/ingredients/?name=мол', False),
+    'download_shopping_cart_txt': (
+        '/api/recipes/download_shopping_cart/?format=txt', True
+    ),
+    'download_shopping_cart_pdf': (
+        '/api/recipes/download_shopping_cart/?format=pdf', True
+    ),
+}
+DEFAULT_BUDGETS = {
+    'recipes': {'queries': 8},
+    'recipes_anonymous': {'queries': 6},
+    'recipes_cursor': {'queries': 8},
+    'recipes_popular': {'queries': 8},
+    'recipes_favorited': {'queries': 8},
+    'recipe': {'queries': 8},
+    'users': {'queries': 5},
+    'subscriptions': {'queries': 6},
+    'ingredients_search': {'queries': 3},
+    'download_shopping_cart_txt': {'queries': 3},
+    'download_shopping_cart_pdf': {'queries': 3},
+}
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[max(ceil(fraction * len(values)) - 1, 0)]
+
+
+def get_content(response):
+    if response.streaming:
+        return b''.join(response.streaming_content)
+    return response.content
+
+
+def seed(size, seed):
+    call_command('add_ingredients')
+    call_command(
+        'seed_demo_data', users=max(size // 5, 10), recipes=size, seed=seed,
+        prefix=BENCHMARK_PREFIX
+    )
+    user = User.objects.filter(
+        username__startswith=BENCHMARK_PREFIX
+    ).annotate(
+        subscriptions_count=Count('subscriptions')
+    ).order_by('-subscriptions_count', 'id').first()
+    recipes = list(Recipe.objects.order_by(
+        '-favorites_count', 'id'
+    ).values_list('id', flat=True)[:max(BENCHMARK_FAVORITES, BENCHMARK_CART)])
+    for model, count in (
+        (Favorite, BENCHMARK_FAVORITES), (ShoppingCart, BENCHMARK_CART)
+    ):
+        model.objects.bulk_create([
+            model(user=user, recipe_id=recipe_id)
+            for recipe_id in recipes[:count]
+        ], ignore_conflicts=True)
+    return user, {'recipe': recipes[0]}
+
+
+def measure(client, path, repeat, warmup, warm_cache):
+    timings, queries, sql_times = [], [], []
+    for run in range(warmup + repeat):
+        if not warm_cache:
+            cache.clear()
+        stats = QueryStats()
+        with connection.execute_wrapper(stats):
+            started = time.perf_counter()
+            response = client.get(path)
+            get_content(response)
+            elapsed = time.perf_counter() - started
+        if run < warmup:
+            continue
+        timings.append(elapsed * 1000)
+        queries.append(stats.count)
+        sql_times.append(stats.time * 1000)
+    return {
+        'status': response.status_code,
+        'p50_ms': percentile(timings, 0.5),
+        'p95_ms': percentile(timings, 0.95),
+        'queries': max(queries),
+        'sql_ms': percentile(sql_times, 0.5),
+    }
+
+
+def check_budgets(results, budgets):
+    exceeded = []
+    for size, endpoints in results.items():
+        for name, result in endpoints.items():
+            if result['status'] >= 400:
+                exceeded.append(BAD_STATUS_MESSAGE.format(
+                    name, size, result['status']
+                ))
+            for metric, budget in budgets.get(name, {}).items():
+                if result[metric] > budget:
+                    exceeded.append(BUDGET_EXCEEDED_MESSAGE.format(
+                        name, size, metric, round(result[metric], 1), budget
+                    ))
+    return exceeded
+
+
+class Command(BaseCommand):
+    help = (
+        'Измеряет время ответа и количество SQL-запросов эндпоинтов API '
+        'на демонстрационных данных разного размера.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', type=int, nargs='+', default=[1000, 5000]
+        )
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--warmup', type=int, default=2)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--endpoints', nargs='+', choices=ENDPOINTS)
+        parser.add_argument('--budgets')
+        parser.add_argument('--output')
+        parser.add_argument('--warm-cache', action='store_true')
+
+    def benchmark(self, size, options):
+        user, ids = seed(size, options['seed'])
+        clients = {False: APIClient(), True: APIClient()}
+        clients[True].force_authenticate(user)
+        results = {}
+        for name in options['endpoints'] or ENDPOINTS:
+            path, authenticated = ENDPOINTS[name]
+            results[name] = measure(
+                clients[authenticated], path.format(**ids),
+                options['repeat'], options['warmup'], options['warm_cache']
+            )
+            print(BENCHMARK_RESULT_MESSAGE.format(
+                size=size, name=name, **results[name]
+            ))
+        return results
+
+    def handle(self, *args, **options):
+        budgets = {
+            name: dict(budget) for name, budget in DEFAULT_BUDGETS.items()
+        }
+        if options['budgets']:
+            with open(options['budgets'], encoding='UTF-8') as file:
+                for name, budget in json.load(file).items():
+                    budgets.setdefault(name, {}).update(budget)
+        setup_test_environment()
+        results = {}
+        try:
+            with TemporaryDirectory() as directory, override_settings(
+                CACHES=BENCHMARK_CACHES, MEDIA_ROOT=directory,
+                METRICS_DIR=os.path.join(directory, 'metrics')
+            ):
+                for size in options['sizes']:
+                    name = connection.settings_dict['NAME']
+                    connection.creation.create_test_db(
+                        verbosity=0, autoclobber=True, serialize=False
+                    )
+                    try:
+                        results[size] = self.benchmark(size, options)
+                    finally:
+                        connection.creation.destroy_test_db(
+                            name, verbosity=0
+                        )
+        finally:
+            teardown_test_environment()
+        exceeded = check_budgets(results, budgets)
+        if options['output']:
+            with open(options['output'], 'w', encoding='UTF-8') as file:
+                json.dump(
+                    {'results': results, 'budgets': budgets,
+                     'exceeded': exceeded},
+                    file, ensure_ascii=False, indent=2
+                )
+        if exceeded:
+            raise CommandError(BUDGETS_EXCEEDED_ERROR.format(
+                '; '.join(exceeded)
+            ))
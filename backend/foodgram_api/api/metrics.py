@@ -0,0 +1,172 @@
+from collections import Counter, defaultdict
+import json
+import os
+import re
+import threading
+import time
+import uuid
+
+from django.conf import settings
+
+METRICS_FILE = '{}-{}.json'
+METRICS_FILE_SUFFIX = '.json'
+METRIC_SERIES = '{}{{{}}}'
+METRIC_LABEL = '{}="{}"'
+METRICS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+HISTOGRAM_SUFFIXES = ('_bucket', '_sum', '_count')
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+MICROSECONDS = 1000000
+BUCKET_LABEL = re.compile(r'le="([^"]+)"')
+METRICS = {
+    'foodgram_http_requests_total': (
+        'counter', 'Количество запросов по представлениям и действиям.'
+    ),
+    'foodgram_http_request_duration_seconds': (
+        'histogram', 'Время обработки запросов в секундах.'
+    ),
+    'foodgram_db_queries_total': (
+        'counter', 'Количество SQL-запросов по представлениям и действиям.'
+    ),
+    'foodgram_db_query_seconds_total': (
+        'counter', 'Суммарное время SQL-запросов в секундах.'
+    ),
+    'foodgram_shopping_list_render_seconds': (
+        'histogram', 'Время формирования файла со списком покупок в секундах.'
+    ),
+    'foodgram_cache_hits_total': ('counter', 'Попадания в кэш.'),
+    'foodgram_cache_misses_total': ('counter', 'Промахи кэша.'),
+    'foodgram_cache_hit_ratio': ('gauge', 'Доля попаданий в кэш.'),
+}
+CACHE_ACCESS_METRICS = {
+    True: 'foodgram_cache_hits_total',
+    False: 'foodgram_cache_misses_total',
+}
+HISTOGRAMS = {
+    name for name, (kind, _) in METRICS.items() if kind == 'histogram'
+}
+
+
+def get_series(name, labels):
+    return METRIC_SERIES.format(name, ','.join(
+        METRIC_LABEL.format(label, value) for label, value in labels.items()
+    ))
+
+
+def get_metric_name(name):
+    for suffix in HISTOGRAM_SUFFIXES:
+        base = name[:-len(suffix)]
+        if name.endswith(suffix) and base in HISTOGRAMS:
+            return base
+    return name
+
+
+def get_series_order(series):
+    match = BUCKET_LABEL.search(series)
+    return BUCKET_LABEL.sub('', series), float(match[1]) if match else 0
+
+
+def is_seconds(name):
+    return '_seconds' in name and not name.endswith(('_bucket', '_count'))
+
+
+def read_metrics_file(path):
+    try:
+        with open(path, encoding='UTF-8') as file:
+            return json.load(file)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+class Metrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.pid = os.getpid()
+        self.name = METRICS_FILE.format(self.pid, uuid.uuid4().hex)
+        self.values = Counter()
+        self.flushed_at = time.monotonic()
+
+    def check_pid(self):
+        if self.pid != os.getpid():
+            self.reset()
+
+    def update(self, values):
+        with self.lock:
+            self.check_pid()
+            self.values.update(values)
+
+    def increment(self, name, value=1, **labels):
+        self.update({get_series(name, labels): value})
+
+    def observe(self, name, seconds, buckets=LATENCY_BUCKETS, **labels):
+        values = Counter({
+            get_series(f'{name}_bucket', {**labels, 'le': bound}): int(
+                bound == '+Inf' or seconds <= bound
+            ) for bound in (*buckets, '+Inf')
+        })
+        values[get_series(f'{name}_count', labels)] = 1
+        values[get_series(f'{name}_sum', labels)] = int(
+            seconds * MICROSECONDS
+        )
+        self.update(values)
+
+    def record_cache_access(self, name, hit):
+        self.increment(CACHE_ACCESS_METRICS[hit], cache=name)
+
+    def flush(self, force=False):
+        now = time.monotonic()
+        with self.lock:
+            self.check_pid()
+            if not force and (
+                now - self.flushed_at < settings.METRICS_FLUSH_INTERVAL
+            ):
+                return
+            values = dict(self.values)
+            self.flushed_at = now
+            path = os.path.join(settings.METRICS_DIR, self.name)
+            os.makedirs(settings.METRICS_DIR, exist_ok=True)
+            with open(path + '.tmp', 'w', encoding='UTF-8') as file:
+                json.dump(values, file)
+            os.replace(path + '.tmp', path)
+
+    def collect(self):
+        self.flush(force=True)
+        values = Counter()
+        for name in os.listdir(settings.METRICS_DIR):
+            if name.endswith(METRICS_FILE_SUFFIX):
+                values.update(read_metrics_file(
+                    os.path.join(settings.METRICS_DIR, name)
+                ))
+        return values
+
+    def export(self, caches=()):
+        values = self.collect()
+        for name in caches:
+            labels = {'cache': name}
+            hits, misses = (
+                values.setdefault(get_series(metric, labels), 0)
+                for metric in CACHE_ACCESS_METRICS.values()
+            )
+            values[get_series('foodgram_cache_hit_ratio', labels)] = (
+                hits / (hits + misses) if hits + misses else 0
+            )
+        samples = defaultdict(list)
+        for name in sorted(values, key=get_series_order):
+            metric = name.split('{', 1)[0]
+            samples[get_metric_name(metric)].append((
+                name, values[name] / MICROSECONDS
+                if is_seconds(metric) else values[name]
+            ))
+        lines = []
+        for name, (kind, description) in METRICS.items():
+            lines.append(f'# HELP {name} {description}')
+            lines.append(f'# TYPE {name} {kind}')
+            lines.extend(
+                f'{series} {value}' for series, value in samples[name]
+            )
+        return '\n'.join(lines) + '\n'
+
+
+metrics = Metrics()
@@ -0,0 +1,116 @@
+from collections import Counter
+import json
+import logging
+import random
+import time
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+
+from .metrics import MICROSECONDS, metrics
+
+SERVER_TIMING = 'db;dur={:.1f};desc="SQL x{}", app;dur={:.1f}'
+
+logger = logging.getLogger(__name__)
+
+
+class QueryStats:
+    def __init__(self):
+        self.count = 0
+        self.time = 0
+        self.statements = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.time += time.perf_counter() - started
+            self.count += 1
+            self.statements[sql] += 1
+
+    def get_repeated(self, threshold):
+        return [
+            {'sql': sql, 'count': count}
+            for sql, count in self.statements.most_common()
+            if count >= threshold
+        ]
+
+
+class InstrumentationMiddleware:
+    def __init__(self, get_response):
+        if not settings.REQUEST_INSTRUMENTATION_SAMPLE_RATE:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if random.random() >= settings.REQUEST_INSTRUMENTATION_SAMPLE_RATE:
+            return self.get_response(request)
+        stats = QueryStats()
+        started = time.perf_counter()
+        with connection.execute_wrapper(stats):
+            response = self.get_response(request)
+        duration = (time.perf_counter() - started) * 1000
+        response['Server-Timing'] = SERVER_TIMING.format(
+            stats.time * 1000, stats.count, duration
+        )
+        repeated = stats.get_repeated(
+            settings.REQUEST_INSTRUMENTATION_REPEATED_QUERIES
+        )
+        match = request.resolver_match
+        logger.log(logging.WARNING if repeated else logging.INFO, json.dumps({
+            'method': request.method,
+            'path': request.path,
+            'view': match and match.view_name,
+            'status': response.status_code,
+            'duration_ms': round(duration, 1),
+            'queries': stats.count,
+            'db_ms': round(stats.time * 1000, 1),
+            'repeated_queries': repeated,
+        }, ensure_ascii=False))
+        return response
+
+
+def get_view_labels(request):
+    method = request.method.lower()
+    match = request.resolver_match
+    view = getattr(match.func, 'cls', None)
+    if view is None:
+        return match.view_name, method
+    actions = getattr(match.func, 'actions', None) or {}
+    return view.__name__, actions.get(method, method)
+
+
+class MetricsMiddleware:
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        stats = QueryStats()
+        started = time.perf_counter()
+        with connection.execute_wrapper(stats):
+            response = self.get_response(request)
+        duration = time.perf_counter() - started
+        if request.resolver_match is not None:
+            view, action = get_view_labels(request)
+            metrics.increment(
+                'foodgram_http_requests_total', view=view, action=action,
+                status=response.status_code
+            )
+            metrics.observe(
+                'foodgram_http_request_duration_seconds', duration,
+                view=view, action=action
+            )
+            metrics.increment(
+                'foodgram_db_queries_total', stats.count,
+                view=view, action=action
+            )
+            metrics.increment(
+                'foodgram_db_query_seconds_total',
+                int(stats.time * MICROSECONDS), view=view, action=action
+            )
+        metrics.flush()
+        return response
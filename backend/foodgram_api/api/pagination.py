@@ -1,5 +1,159 @@
-from rest_framework.pagination import PageNumberPagination
+import base64
+from collections import OrderedDict
+import json
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from .filters import RECIPE_ORDERINGS
+
+APPROXIMATE_COUNT = 'approximate'
+CURSOR_PAGINATION = 'cursor'
+INVALID_CURSOR_ERROR = 'Неверный курсор.'
+PAGINATION_PARAM = 'pagination'
+TABLE_ESTIMATE_SQL = 'SELECT reltuples FROM pg_class WHERE relname = %s'
+
+
+def estimate_count(queryset):
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql' or queryset.query.where:
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(TABLE_ESTIMATE_SQL, [queryset.model._meta.db_table])
+        row = cursor.fetchone()
+    if not row or row[0] < settings.PAGINATION_APPROXIMATE_COUNT_THRESHOLD:
+        return None
+    return int(row[0])
+
+
+class ApproximateCountPaginator(Paginator):
+    @cached_property
+    def count(self):
+        if settings.PAGINATION_COUNT == APPROXIMATE_COUNT:
+            count = estimate_count(self.object_list)
+            if count is not None:
+                return count
+        return super().count
 
 
 class LimitPageNumberPagination(PageNumberPagination):
     page_size_query_param = 'limit'
+    django_paginator_class = ApproximateCountPaginator
+
+
+class KeysetPagination(BasePagination):
+    cursor_query_param = 'cursor'
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = 'limit'
+    ordering = ('-id',)
+
+    def get_ordering(self, request):
+        return self.ordering
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return page_size if page_size > 0 else self.page_size
+
+    def decode_cursor(self, request, model):
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None, False
+        try:
+            position, reverse = json.loads(
+                base64.urlsafe_b64decode(cursor.encode()).decode()
+            )
+            if len(position) != len(self.ordering):
+                raise NotFound(INVALID_CURSOR_ERROR)
+            return [
+                model._meta.get_field(field.lstrip('-')).to_python(value)
+                for field, value in zip(self.ordering, position)
+            ], bool(reverse)
+        except (FieldDoesNotExist, TypeError, ValidationError, ValueError):
+            raise NotFound(INVALID_CURSOR_ERROR)
+
+    def encode_cursor(self, item, reverse):
+        cursor = base64.urlsafe_b64encode(json.dumps([[
+            item._meta.get_field(field.lstrip('-')).value_to_string(item)
+            for field in self.ordering
+        ], reverse]).encode()).decode()
+        return replace_query_param(
+            self.base_url, self.cursor_query_param, cursor
+        )
+
+    def get_position_filter(self, ordering, position):
+        position_filter = Q()
+        for index, field in enumerate(ordering):
+            condition = Q(**{'{}__{}'.format(
+                field.lstrip('-'), 'lt' if field.startswith('-') else 'gt'
+            ): position[index]})
+            for previous_field, value in zip(ordering[:index], position):
+                condition &= Q(**{previous_field.lstrip('-'): value})
+            position_filter |= condition
+        field = ordering[0]
+        return Q(**{'{}__{}'.format(
+            field.lstrip('-'), 'lte' if field.startswith('-') else 'gte'
+        ): position[0]}) & position_filter
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.base_url = request.build_absolute_uri()
+        self.ordering = tuple(self.get_ordering(request))
+        page_size = self.get_page_size(request)
+        position, reverse = self.decode_cursor(request, queryset.model)
+        ordering = tuple(
+            field[1:] if field.startswith('-') else '-' + field
+            for field in self.ordering
+        ) if reverse else self.ordering
+        if position is not None:
+            queryset = queryset.filter(
+                self.get_position_filter(ordering, position)
+            )
+        self.page = list(queryset.order_by(*ordering)[:page_size + 1])
+        has_more = len(self.page) > page_size
+        self.page = self.page[:page_size]
+        if reverse:
+            self.page.reverse()
+        self.has_next = reverse or has_more
+        self.has_previous = has_more if reverse else position is not None
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.page[0], True)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data)
+        ]))
+
+
+class RecipeKeysetPagination(KeysetPagination):
+    def get_ordering(self, request):
+        return RECIPE_ORDERINGS.get(
+            request.query_params.get('ordering'), RECIPE_ORDERINGS['new']
+        ) + ('-id',)
+
+
+class UserKeysetPagination(KeysetPagination):
+    ordering = ('username', 'id')
@@ -1,3 +1,5 @@
+from django.conf import settings
+from django.utils.crypto import constant_time_compare
 from rest_framework.permissions import (
     BasePermission, IsAuthenticatedOrReadOnly, SAFE_METHODS
 )
@@ -14,3 +16,11 @@ class IsAuthorOrReadOnly(IsAuthenticatedOrReadOnly):
             request.method in SAFE_METHODS
             or obj.author == request.user
         )
+
+
+class HasMetricsToken(BasePermission):
+    def has_permission(self, request, view):
+        return bool(settings.METRICS_TOKEN) and constant_time_compare(
+            request.META.get('HTTP_AUTHORIZATION', ''),
+            f'Bearer {settings.METRICS_TOKEN}'
+        )
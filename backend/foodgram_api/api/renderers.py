@@ -0,0 +1,62 @@
+import json
+
+from rest_framework.renderers import BaseRenderer
+
+from .utils import (
+    SHOPPING_LIST_LINE, ingredients_to_csv, ingredients_to_pdf,
+    ingredients_to_text
+)
+
+
+class ShoppingListRenderer(BaseRenderer):
+    streaming = True
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        response = (renderer_context or {}).get('response')
+        if response is not None:
+            response['Content-Type'] = 'application/json'
+        return json.dumps(data, ensure_ascii=False).encode()
+
+    def export(self, ingredients):
+        raise NotImplementedError
+
+
+class PDFShoppingListRenderer(ShoppingListRenderer):
+    media_type = 'application/pdf'
+    format = 'pdf'
+    charset = None
+    streaming = False
+
+    def export(self, ingredients):
+        yield ingredients_to_pdf([
+            SHOPPING_LIST_LINE.format(*ingredient)
+            for ingredient in ingredients
+        ]).getvalue()
+
+
+class CSVShoppingListRenderer(ShoppingListRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+    def export(self, ingredients):
+        for row in ingredients_to_csv(ingredients):
+            yield row.encode(self.charset)
+
+
+class TextShoppingListRenderer(ShoppingListRenderer):
+    media_type = 'text/plain'
+    format = 'txt'
+
+    def export(self, ingredients):
+        for line in ingredients_to_text(ingredients):
+            yield line.encode(self.charset)
+
+
+SHOPPING_LIST_RENDERERS = (
+    PDFShoppingListRenderer, CSVShoppingListRenderer, TextShoppingListRenderer
+)
+RENDERERS_BY_FORMAT = {
+    renderer.format: renderer for renderer in SHOPPING_LIST_RENDERERS
+}
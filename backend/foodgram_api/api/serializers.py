@@ -1,26 +1,36 @@
-from django.db.models import F
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import prefetch_related_objects
 from djoser.serializers import UserSerializer as DjoserUserSerializer
 from rest_framework import serializers
 
-from .fields import ImageField
 from recipes.admin import SAME_INGREDIENTS_ERROR
-from recipes.models import Ingredient, IngredientAmount, Recipe, Tag
+from recipes.cache import get_user_relation_ids
+from recipes.models import (
+    Ingredient, IngredientAmount, Recipe, RecipeQuerySet, Tag
+)
 
+from .fields import ImageField, PrimaryKeyListField, VariantsField, get_in_bulk
 
-class UserSerializer(DjoserUserSerializer):
-    is_subscribed = serializers.BooleanField(read_only=True)
 
-    class Meta(DjoserUserSerializer.Meta):
-        fields = DjoserUserSerializer.Meta.fields + ('is_subscribed',)
+def get_relation_ids(context, relation):
+    relations = context.setdefault('relation_ids', {})
+    if relation not in relations:
+        relations[relation] = get_user_relation_ids(
+            context['request'].user, relation
+        )
+    return relations[relation]
 
 
-class UserReadSerializer(UserSerializer):
+class UserSerializer(DjoserUserSerializer):
     is_subscribed = serializers.SerializerMethodField()
 
+    class Meta(DjoserUserSerializer.Meta):
+        fields = DjoserUserSerializer.Meta.fields + ('is_subscribed',)
+
     def get_is_subscribed(self, instance):
-        return instance.subscribers.filter(
-            user=self.context['request'].user
-        ).exists()
+        return instance.id in get_relation_ids(self.context, 'subscriptions')
 
 
 class IngredientReadSerializer(serializers.ModelSerializer):
@@ -37,63 +47,76 @@ class TagReadSerializer(serializers.ModelSerializer):
         read_only_fields = fields
 
 
+class IngredientAmountListSerializer(serializers.ListSerializer):
+    def to_internal_value(self, data):
+        amounts = super().to_internal_value(data)
+        ingredients = get_in_bulk(
+            Ingredient.objects.all(),
+            [amount['ingredient'] for amount in amounts]
+        )
+        for amount in amounts:
+            amount['ingredient'] = ingredients[amount['ingredient']]
+        return amounts
+
+
 class IngredientAmountSerializer(serializers.ModelSerializer):
-    id = serializers.PrimaryKeyRelatedField(
-        source='ingredient', queryset=Ingredient.objects.all()
-    )
+    id = serializers.IntegerField(source='ingredient', min_value=1)
 
     class Meta:
         model = IngredientAmount
         fields = ('id', 'amount')
+        list_serializer_class = IngredientAmountListSerializer
 
 
-class IngredientAmountReadSerializer(IngredientReadSerializer):
-    amount = serializers.IntegerField()
+class IngredientAmountReadSerializer(serializers.ModelSerializer):
+    id = serializers.ReadOnlyField(source='ingredient.id')
+    name = serializers.ReadOnlyField(source='ingredient.name')
+    measurement_unit = serializers.ReadOnlyField(
+        source='ingredient.measurement_unit'
+    )
 
-    class Meta(IngredientReadSerializer.Meta):
-        fields = IngredientReadSerializer.Meta.fields + ('amount',)
+    class Meta:
+        model = IngredientAmount
+        fields = ('id', 'name', 'measurement_unit', 'amount')
+        read_only_fields = fields
 
 
 class RecipeShortReadSerializer(serializers.ModelSerializer):
     image = ImageField()
+    images = VariantsField(('thumb',))
 
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'images', 'cooking_time')
         read_only_fields = fields
 
 
 class RecipeReadSerializer(RecipeShortReadSerializer):
-    author = serializers.SerializerMethodField()
-    ingredients = serializers.SerializerMethodField()
-    is_favorited = serializers.BooleanField(default=False)
-    is_in_shopping_cart = serializers.BooleanField(default=False)
+    tags = TagReadSerializer(many=True)
+    author = UserSerializer()
+    images = VariantsField(('medium', 'full'))
+    ingredients = IngredientAmountReadSerializer(
+        source='amounts_of_ingredients', many=True
+    )
+    is_favorited = serializers.SerializerMethodField()
+    is_in_shopping_cart = serializers.SerializerMethodField()
 
     class Meta(RecipeShortReadSerializer.Meta):
         fields = RecipeShortReadSerializer.Meta.fields + (
             'tags', 'author', 'ingredients', 'text',
             'is_favorited', 'is_in_shopping_cart'
         )
-        depth = 1
 
-    def get_ingredients(self, instance):
-        return IngredientAmountReadSerializer(instance.ingredients.annotate(
-            amount=F('amounts_for_recipes__amount')
-        ), many=True).data
+    def get_is_favorited(self, instance):
+        return instance.id in get_relation_ids(self.context, 'favorite')
 
-    def get_author(self, instance):
-        return dict(
-            **UserSerializer(instance=instance.author).data,
-            is_subscribed=instance.is_subscribed
-        )
-
-
-class RecipePostReadSerializer(RecipeReadSerializer):
-    author = UserReadSerializer()
+    def get_is_in_shopping_cart(self, instance):
+        return instance.id in get_relation_ids(self.context, 'shopping_cart')
 
 
 class RecipeSerializer(serializers.ModelSerializer):
     ingredients = IngredientAmountSerializer(many=True)
+    tags = PrimaryKeyListField(queryset=Tag.objects.all(), allow_empty=False)
     image = ImageField()
 
     class Meta:
@@ -104,49 +127,95 @@ class RecipeSerializer(serializers.ModelSerializer):
 
     def validate_ingredients(self, ingredients):
         same_ingredients = [
-            ingredient['ingredient'] for ingredient in ingredients
+            ingredient for ingredient, count in Counter(
+                ingredient['ingredient'] for ingredient in ingredients
+            ).items() if count > 1
         ]
-        for ingredient in set(same_ingredients):
-            same_ingredients.remove(ingredient)
         if same_ingredients:
             raise serializers.ValidationError(
                 SAME_INGREDIENTS_ERROR.format([
                     f'id: {ingredient.id} ({ingredient.name})'
-                    for ingredient in set(same_ingredients)
+                    for ingredient in same_ingredients
                 ])
             )
         return ingredients
 
-    def set_m2m_fields(self, recipe, ingredients, tags, clear=False):
-        if clear:
-            recipe.amounts_of_ingredients.all().delete()
-        for ingredient in ingredients:
-            recipe.amounts_of_ingredients.create(
-                ingredient=ingredient['ingredient'],
-                amount=ingredient['amount']
-            )
-        recipe.tags.set(tags, clear=clear)
+    def set_ingredients(self, recipe, ingredients, created=False):
+        amounts = {
+            ingredient['ingredient'].id: ingredient
+            for ingredient in ingredients
+        }
+        current = {} if created else {
+            amount.ingredient_id: amount
+            for amount in recipe.amounts_of_ingredients.all()
+        }
+        removed = current.keys() - amounts.keys()
+        if removed:
+            recipe.amounts_of_ingredients.filter(
+                ingredient_id__in=removed
+            ).delete()
+        changed = []
+        for ingredient_id, amount in current.items():
+            if (
+                ingredient_id in amounts
+                and amount.amount != amounts[ingredient_id]['amount']
+            ):
+                amount.amount = amounts[ingredient_id]['amount']
+                changed.append(amount)
+        if changed:
+            IngredientAmount.objects.bulk_update(changed, ('amount',))
+        IngredientAmount.objects.bulk_create(
+            IngredientAmount(recipe=recipe, **ingredient)
+            for ingredient_id, ingredient in amounts.items()
+            if ingredient_id not in current
+        )
 
+    @transaction.atomic
     def create(self, validated_data):
         ingredients = validated_data.pop('ingredients')
         tags = validated_data.pop('tags')
         recipe = Recipe.objects.create(**validated_data)
-        self.set_m2m_fields(recipe, ingredients, tags)
+        self.set_ingredients(recipe, ingredients, created=True)
+        recipe.tags.set(tags)
         return recipe
 
+    @transaction.atomic
     def update(self, recipe, validated_data):
-        ingredients = validated_data.pop('ingredients')
-        tags = validated_data.pop('tags')
+        ingredients = validated_data.pop('ingredients', None)
+        tags = validated_data.pop('tags', None)
         recipe = super().update(recipe, validated_data)
-        self.set_m2m_fields(recipe, ingredients, tags, clear=True)
+        if ingredients is not None:
+            self.set_ingredients(recipe, ingredients)
+        if tags is not None:
+            recipe.tags.set(tags)
         return recipe
 
     def to_representation(self, instance):
-        if self.context['request'].method == 'POST':
-            return RecipePostReadSerializer(
-                instance, context=self.context
-            ).data
-        return RecipeReadSerializer(instance).data
+        prefetch_related_objects(
+            [instance], *RecipeQuerySet.get_prefetch_lookups()
+        )
+        return RecipeReadSerializer(instance, context=self.context).data
+
+
+def get_recipes_limit(request):
+    limit = request.query_params.get('recipes_limit')
+    return int(limit) if limit and limit.isdigit() else None
+
+
+class SubscribeListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        authors = list(data)
+        recipes = {author.id: [] for author in authors}
+        for recipe in Recipe.objects.only(
+            'id', 'name', 'image', 'has_image_variants', 'cooking_time',
+            'author'
+        ).latest_by_authors(
+            authors, get_recipes_limit(self.context['request'])
+        ):
+            recipes[recipe.author_id].append(recipe)
+        for author in authors:
+            author.latest_recipes = recipes[author.id]
+        return super().to_representation(authors)
 
 
 class SubscribeReadSerializer(UserSerializer):
@@ -156,21 +225,12 @@ class SubscribeReadSerializer(UserSerializer):
     class Meta(UserSerializer.Meta):
         fields = UserSerializer.Meta.fields + ('recipes', 'recipes_count')
         read_only_fields = fields
+        list_serializer_class = SubscribeListSerializer
 
     def get_recipes(self, instance):
-        limit = self.context['request'].query_params.get('recipes_limit')
-        return RecipeShortReadSerializer(
-            instance.recipes.all()[:int(limit) if (
-                limit and limit.isdigit() and int(limit) >= 0
-            ) else None],
-            many=True
-        ).data
-
-
-class SubscribePostReadSerializer(SubscribeReadSerializer):
-    is_subscribed = serializers.SerializerMethodField()
-
-    def get_is_subscribed(self, instance):
-        return instance.subscribers.filter(
-            user=self.context['request'].user
-        ).exists()
+        recipes = getattr(instance, 'latest_recipes', None)
+        if recipes is None:
+            recipes = instance.recipes.all()[
+                :get_recipes_limit(self.context['request'])
+            ]
+        return RecipeShortReadSerializer(recipes, many=True).data
@@ -0,0 +1,80 @@
+import base64
+from io import BytesIO
+import os
+import tracemalloc
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+from PIL import Image
+from rest_framework.exceptions import ValidationError
+from rest_framework.serializers import Serializer
+
+from .fields import ImageField
+
+
+def create_image(size=(10, 10), noise=False):
+    if noise:
+        image = Image.frombytes('RGB', size, os.urandom(size[0] * size[1] * 3))
+    else:
+        image = Image.new('RGB', size)
+    buffer = BytesIO()
+    image.save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+def encode_image(content):
+    return 'data:image/png;base64,' + base64.b64encode(content).decode()
+
+
+class ImageFieldTest(SimpleTestCase):
+    def setUp(self):
+        self.field = ImageField()
+        self.field.bind('image', Serializer())
+
+    def assert_fails(self, data, code):
+        with self.assertRaises(ValidationError) as context:
+            self.field.to_internal_value(data)
+        self.assertEqual(context.exception.detail[0].code, code)
+
+    def test_decodes_image(self):
+        upload = self.field.to_internal_value(encode_image(create_image()))
+        self.assertEqual(Image.open(upload).size, (10, 10))
+
+    def test_invalid_data(self):
+        for data in (
+            'data:image/png;base64,',
+            'data:image/png;base64,abc',
+            'data:image/png;base64,ab=c',
+            'data:text/plain;base64,YWJj',
+            'YWJj',
+        ):
+            with self.subTest(data=data):
+                self.assert_fails(data, 'invalid')
+
+    @override_settings(IMAGE_MAX_UPLOAD_SIZE=1000)
+    def test_oversized_payload_is_rejected_before_decoding(self):
+        with mock.patch.object(ImageField, 'decode') as decode:
+            self.assert_fails(encode_image(b'\0' * 1001), 'max_size')
+        decode.assert_not_called()
+        upload = self.field.to_internal_value(
+            encode_image(create_image(noise=True))
+        )
+        self.assertLessEqual(upload.size, 1000)
+
+    @override_settings(IMAGE_MAX_PIXELS=99)
+    def test_too_many_pixels(self):
+        self.assert_fails(encode_image(create_image((10, 10))), 'max_pixels')
+        self.field.to_internal_value(encode_image(create_image((9, 11))))
+
+    def test_decoding_memory_does_not_depend_on_payload_size(self):
+        content = create_image((1500, 1400), noise=True)
+        data = encode_image(content)
+        tracemalloc.start()
+        try:
+            upload = self.field.to_internal_value(data)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        upload.close()
+        self.assertEqual(upload.size, len(content))
+        self.assertLess(peak, len(content) // 4)
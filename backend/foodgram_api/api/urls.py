@@ -3,7 +3,8 @@ from djoser.views import TokenDestroyView as DjoserTokenDestroyView
 from rest_framework.routers import DefaultRouter
 
 from .views import (
-    IngredientViewSet, RecipeViewSet, TagViewSet, TokenCreateView, UserViewSet
+    IngredientViewSet, MetricsView, RecipeViewSet, TagViewSet,
+    TokenCreateView, UserViewSet
 )
 
 router = DefaultRouter()
@@ -17,5 +18,6 @@ urlpatterns = [
         r"^auth/token/logout/?$", DjoserTokenDestroyView.as_view(),
         name="logout"
     ),
+    re_path(r"^metrics/?$", MetricsView.as_view(), name="metrics"),
     path('', include(router.urls)),
 ]
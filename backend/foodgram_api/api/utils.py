@@ -1,3 +1,4 @@
+import csv
 import io
 import os
 
@@ -10,6 +11,9 @@ from reportlab.platypus import Paragraph, SimpleDocTemplate
 
 from foodgram_api.settings import STATIC_ROOT
 
+SHOPPING_LIST_LINE = '{} ({}) - {}'
+SHOPPING_LIST_CSV_HEADER = ('ингредиент', 'единица измерения', 'количество')
+
 pdfmetrics.registerFont(TTFont(
     'DejaVuSans',
     os.path.join(os.path.join(STATIC_ROOT, 'fonts'), 'DejaVuSans.ttf')
@@ -34,3 +38,20 @@ def ingredients_to_pdf(ingredients):
     doc.build(story)
     buffer.seek(io.SEEK_SET)
     return buffer
+
+
+class Echo:
+    def write(self, value):
+        return value
+
+
+def ingredients_to_text(ingredients):
+    for ingredient in ingredients:
+        yield SHOPPING_LIST_LINE.format(*ingredient) + '\n'
+
+
+def ingredients_to_csv(ingredients):
+    writer = csv.writer(Echo())
+    yield writer.writerow(SHOPPING_LIST_CSV_HEADER)
+    for ingredient in ingredients:
+        yield writer.writerow(ingredient)
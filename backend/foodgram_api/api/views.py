@@ -1,5 +1,11 @@
-from django.db.models import Count, Exists, OuterRef, Sum
-from django.http import FileResponse
+from hashlib import md5
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Sum
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, quote_etag
+from django.utils.http import http_date
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser import utils
 from djoser.conf import settings as djoser_settings
@@ -7,23 +13,36 @@ from djoser.serializers import SetPasswordSerializer, UserCreateSerializer
 from djoser.views import TokenCreateView as DjoserTokenCreateView
 from rest_framework import mixins, status
 from rest_framework.decorators import action
+from rest_framework.fields import BooleanField
 from rest_framework.generics import get_object_or_404
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
+from rest_framework.views import APIView
 from rest_framework.viewsets import (
     GenericViewSet, ModelViewSet, ReadOnlyModelViewSet
 )
 
+from recipes.cache import get_catalogue_version
+from recipes.models import Ingredient, IngredientAmount, Recipe, Tag
+from users.models import SELF_SUBSCRIBE_ERROR, User
+
+from .exports import (
+    EXPORT_FAILED, EXPORT_PENDING, get_export, render_shopping_list,
+    start_export
+)
 from .filters import IngredientFilter, RecipeFilter
-from .permissions import IsAuthorOrReadOnly
+from .metrics import METRICS_CONTENT_TYPE, metrics
+from .pagination import (
+    CURSOR_PAGINATION, PAGINATION_PARAM, RecipeKeysetPagination,
+    UserKeysetPagination
+)
+from .permissions import HasMetricsToken, IsAuthorOrReadOnly
+from .renderers import RENDERERS_BY_FORMAT, SHOPPING_LIST_RENDERERS
 from .serializers import (
-    IngredientReadSerializer, SubscribePostReadSerializer,
-    SubscribeReadSerializer, RecipeReadSerializer, RecipeShortReadSerializer,
-    RecipeSerializer, TagReadSerializer, UserReadSerializer, UserSerializer
+    IngredientReadSerializer, SubscribeReadSerializer, RecipeReadSerializer,
+    RecipeShortReadSerializer, RecipeSerializer, TagReadSerializer,
+    UserSerializer
 )
-from .utils import ingredients_to_pdf
-from recipes.models import Ingredient, Favorite, Recipe, ShoppingCart, Tag
-from users.models import SELF_SUBSCRIBE_ERROR, Subscribe, User
 
 
 DOES_NOT_EXIST_CART_ERROR = 'У пользователя {} нет рецета {} в списке покупок.'
@@ -32,6 +51,44 @@ DOES_NOT_EXIST_SUBSCRIBE_ERROR = 'Пользователь {} не подпис
 UNIQUE_CART_ERROR = 'У пользователя {} уже есть рецепт {} в списке покупок.'
 UNIQUE_FAVORITE_ERROR = 'У пользователя {} уже есть рецепт {} в избранном.'
 UNIQUE_SUBSCRIBE_ERROR = 'Пользователь {} уже подписан на автора {}.'
+EXPORT_FAILED_ERROR = 'Не удалось сформировать список покупок {}.'
+EXPORT_NOT_FOUND_ERROR = 'Список покупок {} не найден.'
+ANONYMOUS_CACHE = 'anonymous'
+ANONYMOUS_CACHE_KEY = 'anonymous:{}'
+CATALOGUE_CACHE = 'catalogue'
+CATALOGUE_CACHE_KEY = 'catalogue:{}'
+SHOPPING_LIST_CACHE = 'shopping_list'
+SHOPPING_LIST_CACHE_KEY = 'shopping_list:{}'
+METRICS_CACHES = (ANONYMOUS_CACHE, CATALOGUE_CACHE, SHOPPING_LIST_CACHE)
+SHOPPING_LIST_DISPOSITION = 'attachment; filename="shopping_list.{}"'
+
+
+def cache_content(key, chunks):
+    content = []
+    for chunk in chunks:
+        content.append(chunk)
+        yield chunk
+    cache.set(key, b''.join(content), settings.SHOPPING_LIST_CACHE_TIMEOUT)
+
+
+def get_export_data(job_id, job):
+    return {
+        'id': job_id,
+        'status': job['status'],
+        'format': job['format'],
+        'wait_time': job['wait_time'],
+        'render_time': job['render_time'],
+    }
+
+
+def get_shopping_list_response(response, renderer):
+    response['Content-Type'] = renderer.media_type + (
+        f'; charset={renderer.charset}' if renderer.charset else ''
+    )
+    response['Content-Disposition'] = SHOPPING_LIST_DISPOSITION.format(
+        renderer.format
+    )
+    return response
 
 
 def get_bad_request_response(message):
@@ -43,7 +100,9 @@ class RelationMixin:
         self, request, id, is_related_name, related_manager_name,
         does_not_exist_error, unique_error
     ):
-        instance = get_object_or_404(self.get_queryset(), id=id)
+        instance = get_object_or_404(
+            self.get_queryset().with_user_flags(request.user), id=id
+        )
         instance_name = 'author' if (
             is_related_name == 'is_subscribed'
         ) else 'recipe'
@@ -78,6 +137,92 @@ class RelationMixin:
         )
 
 
+class KeysetPaginationMixin:
+    keyset_pagination_class = None
+
+    @property
+    def paginator(self):
+        if (
+            not hasattr(self, '_paginator')
+            and self.request.query_params.get(PAGINATION_PARAM)
+            == CURSOR_PAGINATION
+        ):
+            self._paginator = self.keyset_pagination_class()
+        return super().paginator
+
+
+class CatalogueCacheMixin:
+    def list(self, request, *args, **kwargs):
+        catalogue = self.queryset.model._meta.label_lower
+        version = get_catalogue_version(catalogue)
+        digest = md5('{}:{}:{}'.format(
+            catalogue, version,
+            '&'.join(sorted(request.query_params.urlencode().split('&')))
+        ).encode()).hexdigest()
+        etag = quote_etag(digest)
+        response = get_conditional_response(
+            request, etag=etag, last_modified=int(version)
+        )
+        if response is None:
+            key = CATALOGUE_CACHE_KEY.format(digest)
+            data = cache.get(key)
+            metrics.record_cache_access(CATALOGUE_CACHE, data is not None)
+            if data is None:
+                data = super().list(request, *args, **kwargs).data
+                cache.set(key, data, settings.CATALOGUE_CACHE_TIMEOUT)
+            response = Response(data)
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(version)
+        return response
+
+
+class AnonymousCacheMixin:
+    anonymous_cache_catalogues = ()
+
+    def get_anonymous_cache_key(self, request):
+        query = sorted(
+            (key, value)
+            for key, values in request.query_params.lists()
+            for value in values if value
+        )
+        return ANONYMOUS_CACHE_KEY.format(md5(repr((
+            request.build_absolute_uri('/'), self.action,
+            self.kwargs.get(self.lookup_field), query, [
+                get_catalogue_version(catalogue)
+                for catalogue in self.anonymous_cache_catalogues
+            ]
+        )).encode()).hexdigest())
+
+    def get_anonymous_response(self, view, request, *args, **kwargs):
+        if (
+            not request.user.is_anonymous
+            or not settings.ANONYMOUS_CACHE_TIMEOUT
+        ):
+            return view(request, *args, **kwargs)
+        key = self.get_anonymous_cache_key(request)
+        data = cache.get(key)
+        metrics.record_cache_access(ANONYMOUS_CACHE, data is not None)
+        if data is not None:
+            response = Response(data)
+            response['X-Cache'] = 'HIT'
+            return response
+        response = view(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            cache.set(key, response.data, settings.ANONYMOUS_CACHE_TIMEOUT)
+        response['X-Cache'] = 'MISS'
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.get_anonymous_response(
+            super().list, request, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.get_anonymous_response(
+            super().retrieve, request, *args, **kwargs
+        )
+
+
 class TokenCreateView(DjoserTokenCreateView):
     def _action(self, serializer):
         token = utils.login_user(self.request, serializer.user)
@@ -89,31 +234,22 @@ class TokenCreateView(DjoserTokenCreateView):
 
 
 class UserViewSet(
-    mixins.CreateModelMixin, mixins.RetrieveModelMixin,
-    mixins.ListModelMixin, GenericViewSet, RelationMixin
+    KeysetPaginationMixin, mixins.CreateModelMixin,
+    mixins.RetrieveModelMixin, mixins.ListModelMixin, GenericViewSet,
+    RelationMixin
 ):
     serializer_class = UserSerializer
     permission_classes = (AllowAny,)
+    keyset_pagination_class = UserKeysetPagination
 
     def get_queryset(self):
-        queryset = User.objects.annotate(is_subscribed=Exists(
-            Subscribe.objects.filter(
-                author=OuterRef('pk'),
-                user__username=self.request.user.username
-            )
-        )).all()
-        if self.action in ('subscribe', 'subscriptions'):
-            queryset = queryset.annotate(recipes_count=Count('recipes'))
+        queryset = User.objects.all()
         if self.action == 'subscriptions':
             return queryset.filter(subscribers__user=self.request.user)
         return queryset
 
     def get_serializer_class(self):
-        if self.action == 'me':
-            return UserReadSerializer
-        if self.action == 'subscribe':
-            return SubscribePostReadSerializer
-        if self.action == 'subscriptions':
+        if self.action in ('subscribe', 'subscriptions'):
             return SubscribeReadSerializer
         if self.action == 'create':
             return UserCreateSerializer
@@ -156,7 +292,7 @@ class UserViewSet(
         return self.list(request, *args, **kwargs)
 
 
-class IngredientViewSet(ReadOnlyModelViewSet):
+class IngredientViewSet(CatalogueCacheMixin, ReadOnlyModelViewSet):
     queryset = Ingredient.objects.all()
     serializer_class = IngredientReadSerializer
     permission_classes = (AllowAny,)
@@ -169,36 +305,28 @@ class IngredientViewSet(ReadOnlyModelViewSet):
         return super().get_object()
 
 
-class TagViewSet(ReadOnlyModelViewSet):
+class TagViewSet(CatalogueCacheMixin, ReadOnlyModelViewSet):
     queryset = Tag.objects.all()
     serializer_class = TagReadSerializer
     permission_classes = (AllowAny,)
     pagination_class = None
 
 
-class RecipeViewSet(ModelViewSet, RelationMixin):
+class RecipeViewSet(
+    AnonymousCacheMixin, KeysetPaginationMixin, ModelViewSet, RelationMixin
+):
     serializer_class = RecipeSerializer
     permission_classes = (IsAuthorOrReadOnly,)
+    keyset_pagination_class = RecipeKeysetPagination
+    anonymous_cache_catalogues = (
+        Recipe._meta.label_lower, Tag._meta.label_lower,
+        Ingredient._meta.label_lower
+    )
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
 
     def get_queryset(self):
-        return Recipe.objects.annotate(is_subscribed=Exists(
-            Subscribe.objects.filter(
-                author=OuterRef('author'),
-                user__username=self.request.user.username
-            )
-        )).annotate(is_favorited=Exists(
-            Favorite.objects.filter(
-                recipe=OuterRef('id'),
-                user__username=self.request.user.username
-            )
-        )).annotate(is_in_shopping_cart=Exists(
-            ShoppingCart.objects.filter(
-                recipe=OuterRef('id'),
-                user__username=self.request.user.username
-            )
-        )).all()
+        return Recipe.objects.with_related()
 
     def get_serializer_class(self):
         if self.action in ('favorite', 'shopping_cart'):
@@ -207,27 +335,9 @@ class RecipeViewSet(ModelViewSet, RelationMixin):
             return RecipeReadSerializer
         return self.serializer_class
 
-    def filter_queryset(self, queryset):
-        queryset = super().filter_queryset(queryset)
-        tags = self.request.query_params.getlist('tags')
-        if tags and ''.join(tags):
-            filtered_queryset = queryset.filter(tags__slug=tags.pop())
-            for tag in tags:
-                filtered_queryset = filtered_queryset.union(
-                    queryset.filter(tags__slug=tag)
-                )
-            return filtered_queryset.order_by(
-                *queryset.model._meta.ordering
-            )
-        return queryset
-
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
 
-    def update(self, request, *args, **kwargs):
-        kwargs['partial'] = False
-        return super().update(request, *args, **kwargs)
-
     @action(
         ['post', 'delete'],
         detail=False,
@@ -252,16 +362,84 @@ class RecipeViewSet(ModelViewSet, RelationMixin):
             DOES_NOT_EXIST_CART_ERROR, UNIQUE_CART_ERROR
         )
 
-    @action(['get'], detail=False, permission_classes=(IsAuthenticated,))
+    @action(
+        ['get'],
+        detail=False,
+        permission_classes=(IsAuthenticated,),
+        renderer_classes=SHOPPING_LIST_RENDERERS
+    )
     def download_shopping_cart(self, request, *args, **kwargs):
-        response = FileResponse(ingredients_to_pdf([(
-            f'{name} ({measurement_unit}) - {amount}'
-        ) for name, measurement_unit, amount in Ingredient.objects.filter(
-            recipes__shopping_cart__user=self.request.user
-        ).annotate(amount=Sum(
-            'amounts_for_recipes__amount'
-        )).values_list(
-            'name', 'measurement_unit', 'amount'
-        )]), as_attachment=True)
-        response['Content-Type'] = 'application/pdf'
-        return response
+        renderer = request.accepted_renderer
+        ingredients = list(IngredientAmount.objects.filter(
+            recipe__shopping_cart__user=self.request.user
+        ).values_list(
+            'ingredient__name', 'ingredient__measurement_unit'
+        ).annotate(amount=Sum('amount')).order_by('ingredient__name'))
+        key = SHOPPING_LIST_CACHE_KEY.format(md5(
+            f'{renderer.format}:{ingredients}'.encode()
+        ).hexdigest())
+        if request.query_params.get('async') in BooleanField.TRUE_VALUES:
+            job_id = start_export(
+                self.request.user, renderer.format, key, ingredients
+            )
+            return Response(
+                get_export_data(job_id, get_export(job_id, request.user)),
+                status=status.HTTP_202_ACCEPTED
+            )
+        content = cache.get(key)
+        metrics.record_cache_access(SHOPPING_LIST_CACHE, content is not None)
+        if content is not None:
+            response = HttpResponse(content)
+        elif renderer.streaming:
+            response = StreamingHttpResponse(
+                cache_content(key, renderer.export(ingredients))
+            )
+        else:
+            content, render_time = render_shopping_list(
+                renderer.format, ingredients
+            )
+            metrics.observe(
+                'foodgram_shopping_list_render_seconds', render_time,
+                format=renderer.format
+            )
+            cache.set(key, content, settings.SHOPPING_LIST_CACHE_TIMEOUT)
+            response = HttpResponse(content)
+        return get_shopping_list_response(response, renderer)
+
+    @action(
+        ['get'],
+        detail=False,
+        url_path=r'download_shopping_cart/(?P<job_id>[0-9a-f]{32})',
+        permission_classes=(IsAuthenticated,),
+        renderer_classes=SHOPPING_LIST_RENDERERS
+    )
+    def shopping_cart_export(self, request, job_id, *args, **kwargs):
+        job = get_export(job_id, self.request.user)
+        if job is None:
+            return Response(
+                {'errors': EXPORT_NOT_FOUND_ERROR.format(job_id)},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        if job['status'] == EXPORT_PENDING:
+            return Response(
+                get_export_data(job_id, job), status=status.HTTP_202_ACCEPTED
+            )
+        content = cache.get(job['key'])
+        if job['status'] == EXPORT_FAILED or content is None:
+            return Response(
+                {'errors': EXPORT_FAILED_ERROR.format(job_id)},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+        return get_shopping_list_response(
+            HttpResponse(content), RENDERERS_BY_FORMAT[job['format']]
+        )
+
+
+class MetricsView(APIView):
+    authentication_classes = ()
+    permission_classes = (HasMetricsToken,)
+
+    def get(self, request, *args, **kwargs):
+        return HttpResponse(
+            metrics.export(METRICS_CACHES), content_type=METRICS_CONTENT_TYPE
+        )
@@ -1,5 +1,6 @@
 import os
 import re
+import tempfile
 
 from dotenv import load_dotenv
 
@@ -33,6 +34,8 @@ AUTH_USER_MODEL = 'users.User'
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'api.middleware.MetricsMiddleware',
+    'api.middleware.InstrumentationMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -72,6 +75,67 @@ DATABASES = {
     }
 }
 
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', default='foodgram'),
+    }
+}
+
+CATALOGUE_CACHE_TIMEOUT = int(os.getenv('CATALOGUE_CACHE_TIMEOUT', default=60 * 60))
+
+SHOPPING_LIST_CACHE_TIMEOUT = int(os.getenv('SHOPPING_LIST_CACHE_TIMEOUT', default=60 * 60 * 24))
+
+ANONYMOUS_CACHE_TIMEOUT = int(os.getenv('ANONYMOUS_CACHE_TIMEOUT', default=60))
+
+USER_RELATIONS_CACHE_TIMEOUT = int(os.getenv('USER_RELATIONS_CACHE_TIMEOUT', default=60))
+
+IMAGE_MAX_UPLOAD_SIZE = int(os.getenv('IMAGE_MAX_UPLOAD_SIZE', default=10 * 1024 * 1024))
+
+IMAGE_MAX_PIXELS = int(os.getenv('IMAGE_MAX_PIXELS', default=50 * 1000 * 1000))
+
+IMAGE_VARIANTS_EXECUTOR = os.getenv('IMAGE_VARIANTS_EXECUTOR', default='process')
+
+IMAGE_VARIANTS_WORKERS = int(os.getenv('IMAGE_VARIANTS_WORKERS', default=2))
+
+SHOPPING_LIST_EXPORT_EXECUTOR = os.getenv('SHOPPING_LIST_EXPORT_EXECUTOR', default='process')
+
+SHOPPING_LIST_EXPORT_WORKERS = int(os.getenv('SHOPPING_LIST_EXPORT_WORKERS', default=2))
+
+INGREDIENT_SEARCH_BACKEND = os.getenv('INGREDIENT_SEARCH_BACKEND', default='index')
+
+POPULARITY_HALF_LIFE_HOURS = float(os.getenv('POPULARITY_HALF_LIFE_HOURS', default=72))
+
+POPULARITY_WINDOW_DAYS = int(os.getenv('POPULARITY_WINDOW_DAYS', default=30))
+
+REQUEST_INSTRUMENTATION_SAMPLE_RATE = float(os.getenv('REQUEST_INSTRUMENTATION_SAMPLE_RATE', default=0))
+
+REQUEST_INSTRUMENTATION_REPEATED_QUERIES = int(os.getenv('REQUEST_INSTRUMENTATION_REPEATED_QUERIES', default=5))
+
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', default='1') == '1'
+
+METRICS_FLUSH_INTERVAL = float(os.getenv('METRICS_FLUSH_INTERVAL', default=10))
+
+METRICS_DIR = os.getenv('METRICS_DIR', default=os.path.join(tempfile.gettempdir(), 'foodgram_metrics'))
+
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', default='')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'api.middleware': {
+            'handlers': ['console'],
+            'level': 'INFO',
+        },
+    },
+}
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -113,3 +177,7 @@ REST_FRAMEWORK = {
     'DEFAULT_PAGINATION_CLASS': 'api.pagination.LimitPageNumberPagination',
     'PAGE_SIZE': 6,
 }
+
+PAGINATION_COUNT = os.getenv('PAGINATION_COUNT', default='exact')
+
+PAGINATION_APPROXIMATE_COUNT_THRESHOLD = int(os.getenv('PAGINATION_APPROXIMATE_COUNT_THRESHOLD', default=100000))
@@ -1,3 +1,5 @@
+from collections import Counter
+
 from django import forms
 from django.contrib import admin
 
@@ -11,18 +13,20 @@ SAME_INGREDIENTS_ERROR = 'Ингредиенты {} указаны нескол
 
 class IngredientAmountInlineFormset(forms.models.BaseInlineFormSet):
     def clean(self):
-        ingredients = []
-        for form in self.forms:
-            if form.cleaned_data:
-                ingredients.append(form.cleaned_data['ingredient'])
+        ingredients = Counter(
+            form.cleaned_data['ingredient']
+            for form in self.forms if form.cleaned_data
+        )
         if not ingredients:
             raise forms.ValidationError(INGREDIENTS_COUNT_ERROR)
-        for ingredient in set(ingredients):
-            ingredients.remove(ingredient)
-        if ingredients:
+        same_ingredients = [
+            ingredient for ingredient, count in ingredients.items()
+            if count > 1
+        ]
+        if same_ingredients:
             raise forms.ValidationError(SAME_INGREDIENTS_ERROR.format([
                 f'id: {ingredient.id} ({ingredient.name})'
-                for ingredient in set(ingredients)
+                for ingredient in same_ingredients
             ]))
 
 
@@ -49,9 +53,10 @@ class IngredientAmountAdmin(admin.ModelAdmin):
 
 @admin.register(Recipe)
 class RecipeAdmin(admin.ModelAdmin):
-    list_display = ('name', 'author')
+    list_display = ('name', 'author', 'favorites_count', 'carts_count')
     list_filter = ('author', 'name', 'tags')
     search_fields = ('author', 'name')
+    readonly_fields = ('favorites_count', 'carts_count')
     empty_value_display = '-пусто-'
     inlines = (IngredientAmountInline,)
 
@@ -0,0 +1,51 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+CATALOGUE_VERSION_KEY = 'catalogue:{}:version'
+USER_RELATION_IDS_KEY = 'user:{}:{}:ids'
+USER_RELATIONS = {
+    'favorite': 'recipe_id',
+    'shopping_cart': 'recipe_id',
+    'subscriptions': 'author_id',
+}
+
+
+def get_catalogue_version(name):
+    key = CATALOGUE_VERSION_KEY.format(name)
+    version = cache.get(key)
+    if version is not None:
+        return version
+    version = time.time()
+    if cache.add(key, version, settings.CATALOGUE_CACHE_TIMEOUT):
+        return version
+    return cache.get(key, version)
+
+
+def invalidate_catalogue(name):
+    cache.set(
+        CATALOGUE_VERSION_KEY.format(name), time.time(),
+        settings.CATALOGUE_CACHE_TIMEOUT
+    )
+
+
+def get_user_relation_ids(user, relation):
+    if user.is_anonymous:
+        return frozenset()
+    key = USER_RELATION_IDS_KEY.format(user.id, relation)
+    ids = cache.get(key)
+    if ids is not None:
+        return ids
+    ids = frozenset(getattr(user, relation).values_list(
+        USER_RELATIONS[relation], flat=True
+    ))
+    cache.set(key, ids, settings.USER_RELATIONS_CACHE_TIMEOUT)
+    return ids
+
+
+def invalidate_user_relation_ids(relations):
+    cache.delete_many([
+        USER_RELATION_IDS_KEY.format(user_id, relation)
+        for user_id, relation in relations
+    ])
@@ -0,0 +1,52 @@
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import logging
+import threading
+
+EXECUTOR_SYNC = 'sync'
+BROKEN_EXECUTOR_MESSAGE = 'Пул процессов {} не работает и будет пересоздан.'
+
+executors = {}
+executors_lock = threading.Lock()
+logger = logging.getLogger(__name__)
+
+
+class SyncExecutor:
+    def submit(self, function, *args, **kwargs):
+        future = Future()
+        try:
+            future.set_result(function(*args, **kwargs))
+        except Exception as error:
+            future.set_exception(error)
+        return future
+
+
+def create_executor(kind, max_workers):
+    if kind == EXECUTOR_SYNC:
+        return SyncExecutor()
+    return ProcessPoolExecutor(max_workers=max_workers)
+
+
+def get_executor(name, kind, max_workers):
+    key = name, kind, max_workers
+    with executors_lock:
+        if key not in executors:
+            executors[key] = create_executor(kind, max_workers)
+        return executors[key]
+
+
+def discard_executor(name, kind, max_workers, executor):
+    with executors_lock:
+        if executors.get((name, kind, max_workers)) is executor:
+            del executors[name, kind, max_workers]
+    executor.shutdown(wait=False)
+
+
+def submit(name, kind, max_workers, function, *args):
+    executor = get_executor(name, kind, max_workers)
+    try:
+        return executor.submit(function, *args)
+    except BrokenProcessPool:
+        logger.warning(BROKEN_EXECUTOR_MESSAGE.format(name))
+        discard_executor(name, kind, max_workers, executor)
+    return get_executor(name, kind, max_workers).submit(function, *args)
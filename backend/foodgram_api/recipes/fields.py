@@ -1,3 +1,4 @@
+from django.db.models import FloatField, PositiveIntegerField
 from django.db.models import SlugField as DjangoModelsSlugField
 from django.forms import SlugField as DjangoFormsSlugField
 
@@ -17,3 +18,32 @@ class ModelsSlugField(DjangoModelsSlugField):
             'allow_unicode': self.allow_unicode,
             **kwargs,
         })
+
+
+class CounterField(PositiveIntegerField):
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault('default', 0)
+        kwargs.setdefault('editable', False)
+        super().__init__(*args, **kwargs)
+
+
+class ScoreField(FloatField):
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault('default', 0)
+        kwargs.setdefault('editable', False)
+        super().__init__(*args, **kwargs)
+
+
+class CountersMixin:
+    def save(self, *args, **kwargs):
+        if (
+            not self._state.adding
+            and not kwargs.get('force_insert')
+            and kwargs.get('update_fields') is None
+        ):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and not isinstance(field, (CounterField, ScoreField))
+            ]
+        super().save(*args, **kwargs)
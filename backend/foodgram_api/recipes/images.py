@@ -0,0 +1,139 @@
+from functools import lru_cache, partial
+from io import BytesIO
+import logging
+import os
+import threading
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections
+from PIL import Image, ImageOps
+
+from .executors import submit
+from .models import Recipe
+from .storage import recipe_image_storage
+
+IMAGE_VARIANTS = {
+    'thumb': 320,
+    'medium': 640,
+    'full': 1280,
+}
+IMAGE_VARIANT_FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpg': ('JPEG', {'quality': 85, 'optimize': True, 'progressive': True}),
+}
+IMAGE_VARIANTS_DIRECTORY = 'variants'
+IMAGE_VARIANT_NAME = '{}/' + IMAGE_VARIANTS_DIRECTORY + '/{}_{}.{}'
+IMAGE_VARIANTS_ERROR = 'Не удалось подготовить варианты изображения {}.'
+
+logger = logging.getLogger(__name__)
+
+
+@lru_cache(maxsize=None)
+def get_variant_formats():
+    Image.init()
+    return tuple(
+        extension
+        for extension, (format, options) in IMAGE_VARIANT_FORMATS.items()
+        if format in Image.SAVE
+    )
+
+
+def get_variant_name(name, variant, extension):
+    directory, filename = os.path.split(name)
+    return IMAGE_VARIANT_NAME.format(
+        directory, os.path.splitext(filename)[0], variant, extension
+    )
+
+
+def create_image_variants(name):
+    missing = {
+        (variant, extension): get_variant_name(name, variant, extension)
+        for variant in IMAGE_VARIANTS
+        for extension in get_variant_formats()
+    }
+    missing = {
+        key: variant_name for key, variant_name in missing.items()
+        if not default_storage.exists(variant_name)
+    }
+    if not missing:
+        return
+    with recipe_image_storage.open(name) as file:
+        image = ImageOps.exif_transpose(Image.open(file)).convert('RGB')
+    for variant, size in IMAGE_VARIANTS.items():
+        resized = image.copy()
+        resized.thumbnail((size, size), Image.Resampling.LANCZOS)
+        for extension in get_variant_formats():
+            if (variant, extension) not in missing:
+                continue
+            format, options = IMAGE_VARIANT_FORMATS[extension]
+            content = BytesIO()
+            resized.save(content, format, **options)
+            default_storage.save(
+                missing[variant, extension], ContentFile(content.getvalue())
+            )
+
+
+def delete_image_variants(name):
+    for variant in IMAGE_VARIANTS:
+        for extension in get_variant_formats():
+            default_storage.delete(get_variant_name(name, variant, extension))
+
+
+def get_image_names():
+    directory = recipe_image_storage.path(
+        Recipe._meta.get_field('image').upload_to
+    )
+    for root, directories, filenames in os.walk(directory):
+        directories[:] = [
+            name for name in directories if name != IMAGE_VARIANTS_DIRECTORY
+        ]
+        for filename in filenames:
+            yield os.path.relpath(
+                os.path.join(root, filename), recipe_image_storage.location
+            )
+
+
+def get_modified_time(name):
+    try:
+        return os.path.getmtime(recipe_image_storage.path(name))
+    except FileNotFoundError:
+        return None
+
+
+def delete_orphan_image(name, deadline):
+    with recipe_image_storage.lock():
+        modified = get_modified_time(name)
+        if modified is None or modified >= deadline:
+            return False
+        recipe_image_storage.delete(name)
+        delete_image_variants(name)
+    return True
+
+
+def finish_image_variants(recipe_id, name, submitter, future):
+    try:
+        future.result()
+        Recipe.objects.filter(pk=recipe_id, image=name).update(
+            has_image_variants=True
+        )
+    except Exception:
+        logger.exception(IMAGE_VARIANTS_ERROR.format(name))
+    finally:
+        if threading.get_ident() != submitter:
+            close_old_connections()
+
+
+def start_image_variants(recipe_id, name):
+    try:
+        future = submit(
+            __name__, settings.IMAGE_VARIANTS_EXECUTOR,
+            settings.IMAGE_VARIANTS_WORKERS, create_image_variants, name
+        )
+    except Exception:
+        logger.exception(IMAGE_VARIANTS_ERROR.format(name))
+        return
+    future.add_done_callback(partial(
+        finish_image_variants, recipe_id, name, threading.get_ident()
+    ))
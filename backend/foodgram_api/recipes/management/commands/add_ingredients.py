@@ -1,24 +1,114 @@
+import csv
+from functools import partial
+from itertools import islice
 import json
 import os
+import re
+import time
 
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 
 from foodgram_api.settings import STATIC_ROOT
+from recipes.cache import invalidate_catalogue
 from recipes.models import Ingredient
 
-ADDED_INGREDIENTS_COUNT_MESSAGE = 'Количество добавленных ингредиентов: {}.'
+ADDED_INGREDIENTS_COUNT_MESSAGE = (
+    'Прочитано ингредиентов: {}, добавлено: {}, пропущено: {}. '
+    'Время: {:.1f} с, строк в секунду: {:.0f}.'
+)
+INGREDIENTS_FORMAT_ERROR = 'Неподдерживаемый формат файла: {}.'
+INGREDIENTS_JSON_ERROR = 'Некорректный JSON после позиции {}.'
+INGREDIENTS_CSV_ERROR = (
+    'Строка {}: ожидаются название и единица измерения, получено: {}.'
+)
+DEFAULT_INGREDIENTS_PATH = os.path.join(
+    STATIC_ROOT, 'data', 'ingredients.json'
+)
+DEFAULT_BATCH_SIZE = 1000
+READ_CHUNK_SIZE = 64 * 1024
+JSON_SEPARATORS = re.compile(r'[\s,\[\]]*')
+
+
+def read_csv(file):
+    reader = csv.reader(file)
+    for row in reader:
+        if not row:
+            continue
+        if len(row) < 2:
+            raise CommandError(INGREDIENTS_CSV_ERROR.format(
+                reader.line_num, row
+            ))
+        yield row[0], row[1]
+
+
+def read_json(file):
+    decoder = json.JSONDecoder()
+    buffer = ''
+    offset = 0
+    for chunk in iter(partial(file.read, READ_CHUNK_SIZE), ''):
+        buffer += chunk
+        position = 0
+        while True:
+            position = JSON_SEPARATORS.match(buffer, position).end()
+            try:
+                ingredient, position = decoder.raw_decode(buffer, position)
+            except ValueError:
+                break
+            yield ingredient['name'], ingredient['measurement_unit']
+        offset += position
+        buffer = buffer[position:]
+    if buffer.strip():
+        raise CommandError(INGREDIENTS_JSON_ERROR.format(offset))
+
+
+READERS = {'.csv': read_csv, '.json': read_json}
+
+
+def import_ingredients(rows, batch_size):
+    read = 0
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            return read
+        read += len(batch)
+        Ingredient.objects.bulk_create(
+            [
+                Ingredient(name=name, measurement_unit=measurement_unit)
+                for name, measurement_unit in {
+                    (name.strip().lower(), measurement_unit.strip().lower())
+                    for name, measurement_unit in batch
+                }
+            ],
+            ignore_conflicts=True
+        )
 
 
 class Command(BaseCommand):
+    help = 'Добавляет ингредиенты из файла JSON или CSV.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', nargs='?', default=DEFAULT_INGREDIENTS_PATH
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=DEFAULT_BATCH_SIZE
+        )
+
     def handle(self, *args, **options):
-        rows = []
-        with open(os.path.join(
-            os.path.join(STATIC_ROOT, 'data'), 'ingredients.json'
-        ), encoding='UTF-8') as file:
-            for ingredient in json.load(file):
-                for key, value in ingredient.items():
-                    ingredient[key] = value.lower()
-                rows.append(Ingredient(**ingredient))
+        path = options['path']
+        extension = os.path.splitext(path)[1].lower()
+        if extension not in READERS:
+            raise CommandError(INGREDIENTS_FORMAT_ERROR.format(path))
+        started = time.monotonic()
+        existing = Ingredient.objects.count()
+        with open(path, encoding='UTF-8', newline='') as file:
+            read = import_ingredients(
+                READERS[extension](file), options['batch_size']
+            )
+        added = Ingredient.objects.count() - existing
+        elapsed = time.monotonic() - started
         print(ADDED_INGREDIENTS_COUNT_MESSAGE.format(
-            len(Ingredient.objects.bulk_create(rows))
+            read, added, read - added, elapsed, read / (elapsed or 1)
         ))
+        if added:
+            invalidate_catalogue(Ingredient._meta.label_lower)
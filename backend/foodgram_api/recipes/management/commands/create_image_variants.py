@@ -0,0 +1,33 @@
+import logging
+
+from django.core.management.base import BaseCommand
+
+from recipes.images import IMAGE_VARIANTS_ERROR, create_image_variants
+from recipes.models import Recipe
+
+CREATED_IMAGE_VARIANTS_MESSAGE = (
+    'Подготовлены варианты изображений рецептов: {}, с ошибками: {}.'
+)
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Подготавливает уменьшенные варианты изображений рецептов.'
+
+    def handle(self, *args, **options):
+        created = failed = 0
+        for recipe_id, name in Recipe.objects.filter(
+            has_image_variants=False
+        ).exclude(image='').values_list('id', 'image').iterator():
+            try:
+                create_image_variants(name)
+            except Exception:
+                logger.exception(IMAGE_VARIANTS_ERROR.format(name))
+                failed += 1
+                continue
+            Recipe.objects.filter(pk=recipe_id, image=name).update(
+                has_image_variants=True
+            )
+            created += 1
+        print(CREATED_IMAGE_VARIANTS_MESSAGE.format(created, failed))
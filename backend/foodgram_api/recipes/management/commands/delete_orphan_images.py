@@ -0,0 +1,39 @@
+from itertools import islice
+import time
+
+from django.core.management.base import BaseCommand
+
+from recipes.images import delete_orphan_image, get_image_names
+from recipes.models import Recipe
+
+DELETED_ORPHAN_IMAGES_MESSAGE = (
+    'Удалены неиспользуемые изображения рецептов: {}.'
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет изображения рецептов, на которые не ссылается ни один '
+        'рецепт, вместе с их вариантами.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--min-age', type=float, default=24)
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        deadline = time.time() - options['min_age'] * 3600
+        names = get_image_names()
+        deleted = 0
+        while True:
+            batch = list(islice(names, options['batch_size']))
+            if not batch:
+                break
+            used = set(Recipe.objects.filter(
+                image__in=batch
+            ).values_list('image', flat=True))
+            deleted += sum(
+                delete_orphan_image(name, deadline)
+                for name in batch if name not in used
+            )
+        print(DELETED_ORPHAN_IMAGES_MESSAGE.format(deleted))
@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from recipes.models import Favorite, Recipe, ShoppingCart
+from users.models import User
+
+RECOUNTED_COUNTERS_MESSAGE = (
+    'Пересчитаны счетчики рецептов: {}, пользователей: {}.'
+)
+
+
+def count_related(model, field):
+    return Coalesce(Subquery(
+        model.objects.filter(**{field: OuterRef('pk')}).order_by().values(
+            field
+        ).annotate(count=Count('pk')).values('count'),
+        output_field=IntegerField()
+    ), 0)
+
+
+def recount_counters(recipes, users, favorites, shopping_carts):
+    with transaction.atomic():
+        return (
+            recipes.objects.update(
+                favorites_count=count_related(favorites, 'recipe'),
+                carts_count=count_related(shopping_carts, 'recipe')
+            ),
+            users.objects.update(
+                recipes_count=count_related(recipes, 'author')
+            )
+        )
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счетчики избранного, списков покупок и рецептов.'
+
+    def handle(self, *args, **options):
+        print(RECOUNTED_COUNTERS_MESSAGE.format(
+            *recount_counters(Recipe, User, Favorite, ShoppingCart)
+        ))
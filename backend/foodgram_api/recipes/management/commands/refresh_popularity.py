@@ -0,0 +1,55 @@
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from recipes.models import Favorite, Recipe, ShoppingCart
+
+CART_WEIGHT = 0.5
+FAVORITE_WEIGHT = 1
+REFRESHED_POPULARITY_MESSAGE = 'Обновлена популярность рецептов: {}.'
+WEEK = timedelta(days=7)
+
+
+def refresh_popularity(now=None):
+    now = now or timezone.now()
+    half_life = timedelta(
+        hours=settings.POPULARITY_HALF_LIFE_HOURS
+    ).total_seconds()
+    scores = defaultdict(float)
+    week_favorites = Counter()
+    for model, weight in (
+        (Favorite, FAVORITE_WEIGHT), (ShoppingCart, CART_WEIGHT)
+    ):
+        for recipe_id, created in model.objects.filter(
+            created__gte=now - timedelta(days=settings.POPULARITY_WINDOW_DAYS)
+        ).order_by().values_list('recipe_id', 'created').iterator():
+            age = now - created
+            scores[recipe_id] += weight * 0.5 ** (
+                age.total_seconds() / half_life
+            )
+            if model is Favorite and age <= WEEK:
+                week_favorites[recipe_id] += 1
+    with transaction.atomic():
+        Recipe.objects.filter(
+            Q(trending_score__gt=0) | Q(week_favorites_count__gt=0)
+        ).update(trending_score=0, week_favorites_count=0)
+        Recipe.objects.bulk_update([
+            Recipe(
+                pk=recipe_id,
+                trending_score=score,
+                week_favorites_count=week_favorites[recipe_id]
+            ) for recipe_id, score in scores.items()
+        ], ('trending_score', 'week_favorites_count'), batch_size=1000)
+    return len(scores)
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает популярность рецептов для сортировки ленты.'
+
+    def handle(self, *args, **options):
+        print(REFRESHED_POPULARITY_MESSAGE.format(refresh_popularity()))
@@ -0,0 +1,265 @@
+from contextlib import contextmanager
+import csv
+from datetime import timedelta
+from io import BytesIO, StringIO
+from itertools import accumulate, islice
+import random
+import time
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, models, transaction
+from django.utils import timezone
+from PIL import Image
+
+from recipes.cache import invalidate_catalogue
+from recipes.models import (
+    Favorite, Ingredient, IngredientAmount, Recipe, ShoppingCart, Tag
+)
+from recipes.storage import recipe_image_storage
+from users.models import Subscribe, User
+
+from .recount_counters import recount_counters
+from .refresh_popularity import refresh_popularity
+
+SEEDED_DEMO_DATA_MESSAGE = (
+    'Созданы пользователи: {}, рецепты: {}, ингредиенты рецептов: {}, '
+    'избранное: {}, списки покупок: {}, подписки: {}. Время: {:.1f} с.'
+)
+DEMO_USERS_EXIST_ERROR = (
+    'Пользователи с префиксом «{}» уже существуют, укажите другой префикс.'
+)
+NO_INGREDIENTS_ERROR = (
+    'В базе нет ингредиентов, сначала выполните команду add_ingredients.'
+)
+COPY_NULL = r'\N'
+COPY_SQL = "COPY {} ({}) FROM STDIN WITH (FORMAT csv, NULL '{}')"
+DEMO_PASSWORD = 'foodgram-demo'
+DEMO_RECIPE_NAME = 'Демо-рецепт {}'
+DEMO_RECIPE_TEXT = 'Описание демонстрационного рецепта {}.'
+DEMO_IMAGE_COLOR = (226, 108, 45)
+DEMO_IMAGE_SIZE = (1280, 960)
+DEMO_TAGS = (
+    ('Завтрак', '#E26C2D', 'breakfast'),
+    ('Обед', '#49B64E', 'lunch'),
+    ('Ужин', '#8775D2', 'dinner'),
+)
+POWER_LAW_EXPONENT = 1.2
+
+
+def batches(objects, size):
+    objects = iter(objects)
+    while True:
+        batch = list(islice(objects, size))
+        if not batch:
+            return
+        yield batch
+
+
+@contextmanager
+def explicit_auto_now(model):
+    fields = [
+        field for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now_add', False)
+    ]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+def get_copy_fields(model):
+    return [
+        field for field in model._meta.concrete_fields
+        if not isinstance(field, models.AutoField)
+    ]
+
+
+def write_copy_rows(file, fields, objects):
+    writer = csv.writer(file)
+    for instance in objects:
+        writer.writerow([
+            COPY_NULL if value is None else value
+            for value in (
+                field.get_db_prep_save(
+                    getattr(instance, field.attname), connection
+                ) for field in fields
+            )
+        ])
+
+
+def copy_objects(model, objects):
+    fields = get_copy_fields(model)
+    buffer = StringIO()
+    write_copy_rows(buffer, fields, objects)
+    buffer.seek(0)
+    with connection.cursor() as cursor:
+        cursor.copy_expert(COPY_SQL.format(
+            connection.ops.quote_name(model._meta.db_table),
+            ', '.join(
+                connection.ops.quote_name(field.column) for field in fields
+            ),
+            COPY_NULL
+        ), buffer)
+
+
+def insert(model, objects, batch_size):
+    count = 0
+    with explicit_auto_now(model):
+        for batch in batches(objects, batch_size):
+            if connection.vendor == 'postgresql':
+                copy_objects(model, batch)
+            else:
+                model.objects.bulk_create(batch)
+            count += len(batch)
+    return count
+
+
+def power_law(population, rng):
+    ranks = list(range(1, len(population) + 1))
+    rng.shuffle(ranks)
+    return list(accumulate(rank ** -POWER_LAW_EXPONENT for rank in ranks))
+
+
+def sample(rng, population, weights, count, exclude=None):
+    chosen = dict.fromkeys(
+        rng.choices(population, cum_weights=weights, k=2 * count)
+    )
+    chosen.pop(exclude, None)
+    return list(chosen)[:count]
+
+
+def random_count(rng, average):
+    return int(rng.expovariate(1 / average)) if average else 0
+
+
+def create_demo_image():
+    buffer = BytesIO()
+    Image.new('RGB', DEMO_IMAGE_SIZE, DEMO_IMAGE_COLOR).save(buffer, 'JPEG')
+    return recipe_image_storage.save(
+        Recipe._meta.get_field('image').upload_to + 'demo.jpg',
+        ContentFile(buffer.getvalue())
+    )
+
+
+class Command(BaseCommand):
+    help = 'Создает демонстрационные данные для нагрузочного тестирования.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--recipes', type=int, default=5000)
+        parser.add_argument('--favorites', type=float, default=20)
+        parser.add_argument('--carts', type=float, default=3)
+        parser.add_argument('--subscriptions', type=float, default=10)
+        parser.add_argument('--days', type=int, default=365)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--prefix', default='demo')
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        prefix = options['prefix']
+        batch_size = options['batch_size']
+        if User.objects.filter(username__startswith=prefix).exists():
+            raise CommandError(DEMO_USERS_EXIST_ERROR.format(prefix))
+        ingredients = list(Ingredient.objects.values_list('id', flat=True))
+        if not ingredients:
+            raise CommandError(NO_INGREDIENTS_ERROR)
+        started = time.monotonic()
+        rng = random.Random(options['seed'])
+        now = timezone.now()
+        with transaction.atomic():
+            if not Tag.objects.exists():
+                Tag.objects.bulk_create(
+                    Tag(name=name, color=color, slug=slug)
+                    for name, color, slug in DEMO_TAGS
+                )
+            tags = list(Tag.objects.values_list('id', flat=True))
+            password = make_password(DEMO_PASSWORD)
+            users_count = insert(User, (
+                User(
+                    username=f'{prefix}{number}',
+                    email=f'{prefix}{number}@example.com',
+                    first_name='Демо',
+                    last_name=f'Пользователь {number}',
+                    password=password,
+                    date_joined=now
+                ) for number in range(options['users'])
+            ), batch_size)
+            users = list(User.objects.filter(
+                username__startswith=prefix
+            ).order_by('id').values_list('id', flat=True))
+            image = create_demo_image()
+            authors = power_law(users, rng)
+            recipes_count = insert(Recipe, (
+                Recipe(
+                    author_id=rng.choices(users, cum_weights=authors)[0],
+                    name=DEMO_RECIPE_NAME.format(number),
+                    text=DEMO_RECIPE_TEXT.format(number),
+                    image=image,
+                    cooking_time=rng.randint(5, 180),
+                    pub_date=now - timedelta(
+                        seconds=rng.random() * options['days'] * 86400
+                    )
+                ) for number in range(options['recipes'])
+            ), batch_size)
+            recipes = list(Recipe.objects.filter(
+                author__username__startswith=prefix
+            ).order_by('id').values_list('id', 'pub_date'))
+            recipe_ids = [recipe_id for recipe_id, _ in recipes]
+            common = power_law(ingredients, rng)
+            amounts_count = insert(IngredientAmount, (
+                IngredientAmount(
+                    recipe_id=recipe_id,
+                    ingredient_id=ingredient_id,
+                    amount=rng.randint(1, 500)
+                ) for recipe_id in recipe_ids
+                for ingredient_id in sample(
+                    rng, ingredients, common, rng.randint(3, 12)
+                )
+            ), batch_size)
+            insert(Recipe.tags.through, (
+                Recipe.tags.through(recipe_id=recipe_id, tag_id=tag_id)
+                for recipe_id in recipe_ids
+                for tag_id in rng.sample(
+                    tags, rng.randint(1, min(3, len(tags)))
+                )
+            ), batch_size)
+            popular = power_law(recipes, rng)
+            counts = {}
+            for model, average in (
+                (Favorite, options['favorites']),
+                (ShoppingCart, options['carts'])
+            ):
+                counts[model] = insert(model, (
+                    model(
+                        user_id=user_id,
+                        recipe_id=recipe_id,
+                        created=now - (now - pub_date) * rng.random()
+                    ) for user_id in users
+                    for recipe_id, pub_date in sample(
+                        rng, recipes, popular,
+                        random_count(rng, average)
+                    )
+                ), batch_size)
+            subscriptions_count = insert(Subscribe, (
+                Subscribe(user_id=user_id, author_id=author_id)
+                for user_id in users
+                for author_id in sample(
+                    rng, users, authors,
+                    random_count(rng, options['subscriptions']),
+                    exclude=user_id
+                )
+            ), batch_size)
+        recount_counters(Recipe, User, Favorite, ShoppingCart)
+        refresh_popularity(now)
+        for model in (Recipe, Tag):
+            invalidate_catalogue(model._meta.label_lower)
+        print(SEEDED_DEMO_DATA_MESSAGE.format(
+            users_count, recipes_count, amounts_count, counts[Favorite],
+            counts[ShoppingCart], subscriptions_count,
+            time.monotonic() - started
+        ))
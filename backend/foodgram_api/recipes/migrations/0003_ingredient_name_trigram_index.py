@@ -0,0 +1,29 @@
+from django.db import migrations
+
+CREATE_TRIGRAM_INDEX = (
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm;'
+    'CREATE INDEX IF NOT EXISTS recipes_ingredient_name_trgm '
+    'ON recipes_ingredient USING gin (UPPER(name) gin_trgm_ops);'
+)
+DROP_TRIGRAM_INDEX = 'DROP INDEX IF EXISTS recipes_ingredient_name_trgm;'
+
+
+def create_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(CREATE_TRIGRAM_INDEX)
+
+
+def drop_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(DROP_TRIGRAM_INDEX)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0002_auto_20220621_0312'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_index, drop_trigram_index),
+    ]
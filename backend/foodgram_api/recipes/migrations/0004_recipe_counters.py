@@ -0,0 +1,50 @@
+# Generated by Django 2.2.16 on 2026-10-18 02:10
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+import recipes.fields
+
+
+def count_related(model, field):
+    return Coalesce(models.Subquery(
+        model.objects.filter(**{field: models.OuterRef('pk')}).order_by(
+        ).values(field).annotate(count=models.Count('pk')).values('count'),
+        output_field=models.IntegerField()
+    ), 0)
+
+
+def fill_counters(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    Recipe.objects.update(
+        favorites_count=count_related(
+            apps.get_model('recipes', 'Favorite'), 'recipe'
+        ),
+        carts_count=count_related(
+            apps.get_model('recipes', 'ShoppingCart'), 'recipe'
+        )
+    )
+    apps.get_model('users', 'User').objects.update(
+        recipes_count=count_related(Recipe, 'author')
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0003_ingredient_name_trigram_index'),
+        ('users', '0002_user_recipes_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='carts_count',
+            field=recipes.fields.CounterField(default=0, editable=False, verbose_name='в списках покупок'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=recipes.fields.CounterField(default=0, editable=False, verbose_name='в избранном'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 2.2.16 on 2026-10-18 02:20
+
+from django.db import migrations, models
+import django.utils.timezone
+import recipes.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0004_recipe_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='favorite',
+            name='created',
+            field=models.DateTimeField(auto_now_add=True, db_index=True, default=django.utils.timezone.now, verbose_name='дата добавления'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='shoppingcart',
+            name='created',
+            field=models.DateTimeField(auto_now_add=True, db_index=True, default=django.utils.timezone.now, verbose_name='дата добавления'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='trending_score',
+            field=recipes.fields.ScoreField(default=0, editable=False, verbose_name='популярность'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='week_favorites_count',
+            field=recipes.fields.CounterField(default=0, editable=False, verbose_name='в избранном за неделю'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-favorites_count', '-pub_date'], name='recipe_popular_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-week_favorites_count', '-pub_date'], name='recipe_week_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-trending_score', '-pub_date'], name='recipe_trending_idx'),
+        ),
+    ]
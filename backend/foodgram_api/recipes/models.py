@@ -1,16 +1,23 @@
 from django.db import models
+from django.db.models.functions import RowNumber
+from django_cleanup import cleanup
 
-from .fields import ModelsSlugField
+from .fields import CounterField, CountersMixin, ModelsSlugField, ScoreField
+from .storage import recipe_image_storage
 from .validators import (
     min_cooking_time_validator, min_ingredient_amount_validator,
     validate_hex_color
 )
-from users.models import User
+from users.models import Subscribe, User, get_user_flag
 
 ID_RECIPE_USER_STR = 'id: {}, рецепт: {}, пользователь: {}'
 INGREDIENT_STR = 'id: {}, название: {}, ед.изм.: {}'
 INGREDIENT_AMOUNT_STR = 'id: {}, рецепт: {}, ингедиент: {}, кол-во: {}'
 RECIPE_STR = 'id: {}, название: {}, автор: {}'
+LATEST_RECIPES_SQL = (
+    'SELECT * FROM ({}) ranked WHERE row_number <= %s '
+    'ORDER BY author_id, row_number'
+)
 
 
 class Ingredient(models.Model):
@@ -109,7 +116,51 @@ class Tag(models.Model):
         return self.slug
 
 
-class Recipe(models.Model):
+class RecipeQuerySet(models.QuerySet):
+    @staticmethod
+    def get_prefetch_lookups():
+        return (
+            'tags',
+            models.Prefetch(
+                'amounts_of_ingredients',
+                queryset=IngredientAmount.objects.select_related(
+                    'ingredient'
+                ).order_by('ingredient__name')
+            )
+        )
+
+    def with_related(self):
+        return self.select_related('author').prefetch_related(
+            *self.get_prefetch_lookups()
+        )
+
+    def with_user_flags(self, user):
+        return self.annotate(
+            is_subscribed=get_user_flag(
+                Subscribe.objects, user, author=models.OuterRef('author')
+            ),
+            is_favorited=get_user_flag(
+                Favorite.objects, user, recipe=models.OuterRef('pk')
+            ),
+            is_in_shopping_cart=get_user_flag(
+                ShoppingCart.objects, user, recipe=models.OuterRef('pk')
+            )
+        )
+
+    def latest_by_authors(self, authors, limit=None):
+        queryset = self.filter(author__in=authors)
+        if limit is None:
+            return queryset
+        sql, params = queryset.annotate(row_number=models.Window(
+            expression=RowNumber(),
+            partition_by=[models.F('author')],
+            order_by=[models.F('pub_date').desc(), models.F('id').desc()]
+        )).order_by().query.sql_with_params()
+        return self.raw(LATEST_RECIPES_SQL.format(sql), (*params, limit))
+
+
+@cleanup.ignore
+class Recipe(CountersMixin, models.Model):
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -117,7 +168,12 @@ class Recipe(models.Model):
         verbose_name='автор'
     )
     name = models.CharField('название', max_length=200)
-    image = models.ImageField('изображение', upload_to='recipes/')
+    image = models.ImageField(
+        'изображение',
+        upload_to='recipes/',
+        storage=recipe_image_storage,
+        db_index=True
+    )
     text = models.TextField('описание')
     ingredients = models.ManyToManyField(
         Ingredient, through=IngredientAmount, related_name='recipes'
@@ -130,11 +186,37 @@ class Recipe(models.Model):
         auto_now_add=True,
         verbose_name='дата публикации',
     )
+    has_image_variants = models.BooleanField(
+        'варианты изображения готовы', default=False, editable=False
+    )
+    favorites_count = CounterField('в избранном')
+    carts_count = CounterField('в списках покупок')
+    week_favorites_count = CounterField('в избранном за неделю')
+    trending_score = ScoreField('популярность')
+
+    objects = RecipeQuerySet.as_manager()
 
     class Meta:
         verbose_name = 'рецепт'
         verbose_name_plural = 'рецепты'
         ordering = ('-pub_date',)
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'], name='recipe_pub_date_idx'
+            ),
+            models.Index(
+                fields=['-favorites_count', '-pub_date'],
+                name='recipe_popular_idx'
+            ),
+            models.Index(
+                fields=['-week_favorites_count', '-pub_date'],
+                name='recipe_week_idx'
+            ),
+            models.Index(
+                fields=['-trending_score', '-pub_date'],
+                name='recipe_trending_idx'
+            ),
+        ]
 
     def __str__(self):
         return RECIPE_STR.format(self.pk, self.name, self.author.username)
@@ -153,6 +235,9 @@ class Favorite(models.Model):
         related_name='favorite',
         verbose_name='рецепт'
     )
+    created = models.DateTimeField(
+        'дата добавления', auto_now_add=True, db_index=True
+    )
 
     class Meta:
         verbose_name = 'избранное'
@@ -183,6 +268,9 @@ class ShoppingCart(models.Model):
         related_name='shopping_cart',
         verbose_name='пользователь'
     )
+    created = models.DateTimeField(
+        'дата добавления', auto_now_add=True, db_index=True
+    )
 
     class Meta:
         verbose_name = 'cписок покупок'
@@ -0,0 +1,59 @@
+from bisect import bisect_left
+from itertools import islice
+import threading
+import time
+
+from django.conf import settings
+
+from .cache import get_catalogue_version
+from .models import Ingredient
+
+PREFIX_END = '\U0010ffff'
+
+
+class IngredientSearchIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._built_at = None
+        self._rows = ((), ())
+
+    def is_fresh(self, version):
+        return version == self._version and (
+            time.monotonic() - self._built_at
+            < settings.CATALOGUE_CACHE_TIMEOUT
+        )
+
+    def refresh(self):
+        version = get_catalogue_version(Ingredient._meta.label_lower)
+        if self.is_fresh(version):
+            return
+        with self._lock:
+            if self.is_fresh(version):
+                return
+            rows = sorted(
+                (name.lower(), id)
+                for id, name in Ingredient.objects.values_list('id', 'name')
+            )
+            self._rows = (
+                tuple(name for name, _ in rows), tuple(id for _, id in rows)
+            )
+            self._version = version
+            self._built_at = time.monotonic()
+
+    def search(self, query, limit=None):
+        self.refresh()
+        names, ids = self._rows
+        query = query.lower()
+        start = bisect_left(names, query)
+        end = bisect_left(names, query + PREFIX_END, start)
+        result = list(ids[start:end][:limit])
+        if limit is None or len(result) < limit:
+            result.extend(islice((
+                id for name, id in zip(names, ids)
+                if query in name and not name.startswith(query)
+            ), None if limit is None else limit - len(result)))
+        return result
+
+
+ingredient_search_index = IngredientSearchIndex()
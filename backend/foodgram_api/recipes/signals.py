@@ -0,0 +1,169 @@
+from collections import defaultdict
+from functools import partial
+import threading
+
+from django.core.signals import request_started
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.db.models.signals import (
+    post_delete, post_save, pre_delete, pre_save
+)
+from django.dispatch import receiver
+
+from .cache import invalidate_catalogue, invalidate_user_relation_ids
+from .images import start_image_variants
+from .models import Favorite, Ingredient, Recipe, ShoppingCart, Tag
+from users.models import Subscribe, User
+
+COUNTERS = {
+    Favorite: (Recipe, 'recipe_id', 'favorites_count'),
+    Recipe: (User, 'author_id', 'recipes_count'),
+    ShoppingCart: (Recipe, 'recipe_id', 'carts_count'),
+}
+USER_PUBLIC_FIELDS = {'username', 'first_name', 'last_name', 'email'}
+RELATIONS = {
+    Favorite: 'favorite',
+    ShoppingCart: 'shopping_cart',
+    Subscribe: 'subscriptions',
+}
+USER_COUNTERS = (Favorite, ShoppingCart)
+CASCADES = (
+    (Recipe, 'recipe_id'),
+    (User, 'user_id'),
+    (User, 'author_id'),
+)
+
+
+class Deletion(threading.local):
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.ids = defaultdict(set)
+        self.relations = set()
+
+    def is_deleting(self, model, pk):
+        return pk in self.ids[model]
+
+    def is_cascade(self, instance):
+        return any(
+            self.is_deleting(model, getattr(instance, key, None))
+            for model, key in CASCADES
+        )
+
+
+deletion = Deletion()
+
+
+def invalidate_user_relations(relations):
+    invalidate_user_relation_ids(relations)
+    transaction.on_commit(partial(invalidate_user_relation_ids, relations))
+
+
+def update_counter(instance, delta):
+    model, key, counter = COUNTERS[type(instance)]
+    model.objects.filter(pk=getattr(instance, key)).update(
+        **{counter: Greatest(F(counter) + delta, 0)}
+    )
+
+
+def release_user_counters(user_id):
+    for relation in USER_COUNTERS:
+        model, key, counter = COUNTERS[relation]
+        model.objects.filter(pk__in=relation.objects.filter(
+            user_id=user_id
+        ).values(key)).update(**{counter: Greatest(F(counter) - 1, 0)})
+
+
+@receiver(request_started)
+def reset_deletion(sender, **kwargs):
+    deletion.reset()
+
+
+@receiver(pre_delete, sender=Recipe)
+@receiver(pre_delete, sender=User)
+def start_deletion(sender, instance, **kwargs):
+    if sender is User:
+        release_user_counters(instance.pk)
+    deletion.ids[sender].add(instance.pk)
+
+
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=User)
+def finish_deletion(sender, instance, **kwargs):
+    deletion.ids[sender].discard(instance.pk)
+    if deletion.relations:
+        invalidate_user_relations(deletion.relations)
+        deletion.relations = set()
+
+
+@receiver(post_delete, sender=Ingredient)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=Tag)
+def invalidate_catalogue_cache(sender, **kwargs):
+    transaction.on_commit(
+        lambda: invalidate_catalogue(sender._meta.label_lower)
+    )
+
+
+@receiver(post_save, sender=User)
+def invalidate_recipes_cache(sender, created, update_fields, **kwargs):
+    if created or update_fields and not USER_PUBLIC_FIELDS & update_fields:
+        return
+    transaction.on_commit(
+        lambda: invalidate_catalogue(Recipe._meta.label_lower)
+    )
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=ShoppingCart)
+def increment_counter(sender, instance, created, **kwargs):
+    if created:
+        update_counter(instance, 1)
+
+
+@receiver(post_delete, sender=Favorite)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=ShoppingCart)
+def decrement_counter(sender, instance, **kwargs):
+    model, key, _ = COUNTERS[sender]
+    if deletion.is_deleting(model, getattr(instance, key)) or (
+        deletion.is_deleting(User, getattr(instance, 'user_id', None))
+    ):
+        return
+    update_counter(instance, -1)
+
+
+@receiver(post_delete, sender=Favorite)
+@receiver(post_delete, sender=ShoppingCart)
+@receiver(post_delete, sender=Subscribe)
+@receiver(post_save, sender=Favorite)
+@receiver(post_save, sender=ShoppingCart)
+@receiver(post_save, sender=Subscribe)
+def invalidate_user_relation_cache(sender, instance, **kwargs):
+    relations = {(instance.user_id, RELATIONS[sender])}
+    if deletion.is_cascade(instance):
+        deletion.relations |= relations
+        return
+    invalidate_user_relations(relations)
+
+
+@receiver(pre_save, sender=Recipe)
+def reset_image_variants(sender, instance, **kwargs):
+    if instance.has_image_variants and not Recipe.objects.filter(
+        pk=instance.pk, image=instance.image.name
+    ).exists():
+        instance.has_image_variants = False
+
+
+@receiver(post_save, sender=Recipe)
+def schedule_image_variants(sender, instance, **kwargs):
+    if not instance.has_image_variants and instance.image:
+        transaction.on_commit(partial(
+            start_image_variants, instance.pk, instance.image.name
+        ))
@@ -0,0 +1,42 @@
+from contextlib import contextmanager
+import fcntl
+from hashlib import sha256
+import os
+
+from django.core.files.storage import FileSystemStorage
+
+LOCK_NAME = '.lock'
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    @contextmanager
+    def lock(self):
+        os.makedirs(self.location, exist_ok=True)
+        with open(self.path(LOCK_NAME), 'a') as file:
+            fcntl.flock(file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(file, fcntl.LOCK_UN)
+
+    def get_content_name(self, name, content):
+        digest = sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        hexdigest = digest.hexdigest()
+        return os.path.join(
+            os.path.dirname(name), hexdigest[:2],
+            hexdigest + os.path.splitext(name)[1].lower()
+        )
+
+    def _save(self, name, content):
+        name = self.get_content_name(name, content)
+        with self.lock():
+            if self.exists(name):
+                os.utime(self.path(name))
+                return name
+            return super()._save(name, content)
+
+
+recipe_image_storage = ContentAddressedStorage()
@@ -0,0 +1,321 @@
+import base64
+import csv
+from io import BytesIO, StringIO
+import shutil
+import tempfile
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
+from rest_framework.test import APIClient
+
+from users.models import Subscribe, User
+
+from .management.commands.seed_demo_data import (
+    COPY_NULL, get_copy_fields, write_copy_rows
+)
+from .models import (
+    Favorite, Ingredient, IngredientAmount, Recipe, ShoppingCart, Tag
+)
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def create_image(size=(10, 10)):
+    buffer = BytesIO()
+    Image.new('RGB', size).save(buffer, 'PNG')
+    return 'data:image/png;base64,' + base64.b64encode(
+        buffer.getvalue()
+    ).decode()
+
+
+def create_user(username):
+    return User.objects.create_user(
+        username=username, email=f'{username}@example.com',
+        first_name='Имя', last_name='Фамилия', password='password'
+    )
+
+
+def create_tags(count):
+    Tag.objects.bulk_create(
+        Tag(name=f'Тег {number}', color=f'#00000{number}', slug=f'tag{number}')
+        for number in range(count)
+    )
+    return list(Tag.objects.all())
+
+
+def create_ingredients(count):
+    Ingredient.objects.bulk_create(
+        Ingredient(name=f'ингредиент {number}', measurement_unit='г')
+        for number in range(count)
+    )
+    return list(Ingredient.objects.all())
+
+
+def create_recipes(author, count, tags=(), ingredients=()):
+    Recipe.objects.bulk_create(
+        Recipe(
+            author=author, name=f'Рецепт {number}', text='Описание.',
+            image='recipes/test.png', cooking_time=10
+        ) for number in range(count)
+    )
+    recipes = list(Recipe.objects.filter(author=author))
+    Recipe.tags.through.objects.bulk_create(
+        Recipe.tags.through(recipe=recipe, tag=tag)
+        for recipe in recipes for tag in tags
+    )
+    IngredientAmount.objects.bulk_create(
+        IngredientAmount(recipe=recipe, ingredient=ingredient, amount=1)
+        for recipe in recipes for ingredient in ingredients
+    )
+    return recipes
+
+
+class CopyRowsTest(SimpleTestCase):
+    def test_nullable_fields(self):
+        fields = get_copy_fields(User)
+        buffer = StringIO()
+        write_copy_rows(buffer, fields, [
+            User(username='demo', email='demo@example.com', first_name='')
+        ])
+        row = dict(zip(
+            (field.attname for field in fields),
+            next(csv.reader(StringIO(buffer.getvalue())))
+        ))
+        self.assertEqual(row['last_login'], COPY_NULL)
+        self.assertEqual(row['first_name'], '')
+        self.assertNotIn('""', buffer.getvalue())
+        self.assertEqual(row['username'], 'demo')
+
+
+class RecipeListQueriesTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('user')
+        create_recipes(cls.user, 50, create_tags(3), create_ingredients(5))
+
+    def assert_list_queries(self, client, count):
+        for limit in (1, 50):
+            cache.clear()
+            with self.assertNumQueries(count):
+                response = client.get('/api/recipes/', {'limit': limit})
+            self.assertEqual(len(response.data['results']), limit)
+
+    def test_authenticated(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        self.assert_list_queries(client, 7)
+
+    def test_anonymous(self):
+        self.assert_list_queries(APIClient(), 4)
+
+
+class SubscriptionsQueriesTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        authors = [create_user(f'author{number}') for number in range(10)]
+        for author in authors:
+            create_recipes(author, 5)
+        cls.follower = create_user('follower')
+        cls.reader = create_user('reader')
+        Subscribe.objects.bulk_create(
+            Subscribe(user=cls.follower, author=author) for author in authors
+        )
+        Subscribe.objects.create(user=cls.reader, author=authors[0])
+
+    def test_queries_do_not_depend_on_authors(self):
+        for params in ({}, {'recipes_limit': 3}):
+            for user, authors in ((self.reader, 1), (self.follower, 10)):
+                client = APIClient()
+                client.force_authenticate(user)
+                cache.clear()
+                with self.assertNumQueries(4):
+                    response = client.get(
+                        '/api/users/subscriptions/', {'limit': 10, **params}
+                    )
+                self.assertEqual(len(response.data['results']), authors)
+                for author in response.data['results']:
+                    self.assertEqual(
+                        len(author['recipes']), params.get('recipes_limit', 5)
+                    )
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class RecipeWriteQueriesTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('user')
+        cls.tags = create_tags(3)
+        cls.ingredients = create_ingredients(20)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get_ingredients(self, start, count, amount=1):
+        return [
+            {'id': ingredient.id, 'amount': amount}
+            for ingredient in self.ingredients[start:start + count]
+        ]
+
+    def count_queries(self, method, path, data):
+        cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            response = getattr(self.client, method)(path, data, format='json')
+        self.assertLess(response.status_code, 300, response.data)
+        return len(context), response.data
+
+    def test_create_and_update_queries_do_not_depend_on_ingredients(self):
+        created, updated = [], []
+        for count in (2, 10):
+            queries, recipe = self.count_queries('post', '/api/recipes/', {
+                'name': 'Рецепт', 'text': 'Описание.', 'cooking_time': 10,
+                'image': create_image(), 'tags': [self.tags[0].id],
+                'ingredients': self.get_ingredients(0, count)
+            })
+            created.append(queries)
+            self.assertEqual(len(recipe['ingredients']), count)
+            queries, recipe = self.count_queries(
+                'patch', f'/api/recipes/{recipe["id"]}/', {
+                    'tags': [self.tags[1].id],
+                    'ingredients': (
+                        self.get_ingredients(0, count // 2, amount=2)
+                        + self.get_ingredients(count, count // 2)
+                    )
+                }
+            )
+            updated.append(queries)
+            self.assertEqual(len(recipe['ingredients']), count // 2 * 2)
+        self.assertEqual(created[0], created[1])
+        self.assertEqual(updated[0], updated[1])
+
+
+class RecipeTagsFilterTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        author = create_user('author')
+        tags = {tag.slug: tag for tag in create_tags(3)}
+        for name, slugs in (
+            ('both', ('tag0', 'tag1')), ('first', ('tag0',)),
+            ('other', ('tag2',))
+        ):
+            Recipe.objects.create(
+                author=author, name=name, text='Описание.',
+                image='recipes/test.png', cooking_time=10
+            ).tags.set(tags[slug] for slug in slugs)
+
+    def get_recipes(self, slugs, mode):
+        cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get('/api/recipes/', {
+                'tags': slugs, 'tags_mode': mode, 'limit': 10
+            })
+        self.assertEqual(response.status_code, 200)
+        return {recipe['name'] for recipe in response.data['results']}, [
+            query['sql'] for query in context
+        ]
+
+    def test_modes(self):
+        for slugs, mode, expected in (
+            (['tag0', 'tag1'], 'any', {'both', 'first'}),
+            (['tag0', 'tag1'], 'all', {'both'}),
+            (['tag0', 'tag0'], 'all', {'both', 'first'}),
+            (['tag2'], 'any', {'other'}),
+            (['tag1', 'tag2'], 'all', set()),
+        ):
+            with self.subTest(slugs=slugs, mode=mode):
+                self.assertEqual(self.get_recipes(slugs, mode)[0], expected)
+
+    def test_single_query_without_union(self):
+        for mode in ('any', 'all'):
+            with self.subTest(mode=mode):
+                _, queries = self.get_recipes(['tag0', 'tag1'], mode)
+                page = next(
+                    sql for sql in queries
+                    if 'FROM "recipes_recipe" ' in sql and 'LIMIT' in sql
+                )
+                self.assertIn('recipes_recipe_tags', page)
+                for sql in queries:
+                    self.assertNotIn('UNION', sql.upper())
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        f'{connection.ops.explain_query_prefix()} {page}'
+                    )
+                    plan = ' '.join(str(row) for row in cursor.fetchall())
+                self.assertNotIn('COMPOUND', plan.upper())
+
+
+class UserFlagsPlanTest(TestCase):
+    INDEX_PATTERNS = {
+        'sqlite': (
+            r'SEARCH \S+ USING (?:COVERING )?INDEX '
+            r'sqlite_autoindex_{table}_1 \(user_id=\?'
+        ),
+        'postgresql': r'Index (?:Only )?Scan (?:using|on) {constraint}\b',
+    }
+    RELATIONS = (
+        (Subscribe, 'unique_follow'),
+        (Favorite, 'unique_favorite'),
+        (ShoppingCart, 'unique_shopping_cart'),
+    )
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('user')
+        author = create_user('author')
+        recipe = create_recipes(author, 1)[0]
+        Subscribe.objects.create(user=cls.user, author=author)
+        Favorite.objects.create(user=cls.user, recipe=recipe)
+        ShoppingCart.objects.create(user=cls.user, recipe=recipe)
+
+    def get_plan(self, queryset):
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+        return queryset.explain()
+
+    def test_relations_use_unique_indexes(self):
+        if connection.vendor not in self.INDEX_PATTERNS:
+            self.skipTest(f'Нет шаблона плана для {connection.vendor}.')
+        for queryset, relations in (
+            (Recipe.objects.with_user_flags(self.user), self.RELATIONS),
+            (User.objects.with_user_flags(self.user), self.RELATIONS[:1]),
+        ):
+            plan = self.get_plan(queryset)
+            for model, constraint in relations:
+                with self.subTest(model=queryset.model, relation=model):
+                    self.assertRegex(
+                        plan, self.INDEX_PATTERNS[connection.vendor].format(
+                            table=model._meta.db_table, constraint=constraint
+                        )
+                    )
+        self.assertEqual(
+            list(Recipe.objects.with_user_flags(self.user).values_list(
+                'is_subscribed', 'is_favorited', 'is_in_shopping_cart'
+            )),
+            [(True, True, True)]
+        )
+
+    def test_anonymous_flags_are_constant(self):
+        for queryset, flags in (
+            (Recipe.objects, (
+                'is_subscribed', 'is_favorited', 'is_in_shopping_cart'
+            )),
+            (User.objects, ('is_subscribed',)),
+        ):
+            queryset = queryset.with_user_flags(AnonymousUser())
+            sql = str(queryset.query)
+            for model, _ in self.RELATIONS:
+                self.assertNotIn(model._meta.db_table, sql)
+            self.assertTrue(all(
+                value is False
+                for row in queryset.values_list(*flags) for value in row
+            ))
@@ -0,0 +1,19 @@
+# Generated by Django 2.2.16 on 2026-10-18 02:10
+
+from django.db import migrations
+import recipes.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='recipes_count',
+            field=recipes.fields.CounterField(default=0, editable=False, verbose_name='количество рецептов'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 2.2.16 on 2026-10-18 02:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_user_recipes_count'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['username', 'id'], name='user_username_idx'),
+        ),
+    ]
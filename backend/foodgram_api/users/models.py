@@ -1,13 +1,33 @@
 from django.contrib.auth.models import AbstractUser
+from django.contrib.auth.models import UserManager as DjangoUserManager
 from django.contrib.auth.validators import UnicodeUsernameValidator
 from django.db import models
 from django.forms import ValidationError
 
+from recipes.fields import CounterField, CountersMixin
+
 SUBSCRIBE_STR = 'id: {}, автор: {}, подписчик: {}'
 SELF_SUBSCRIBE_ERROR = 'Нельзя подписаться на самого себя.'
 
 
-class User(AbstractUser):
+def get_user_flag(relations, user, **lookups):
+    if user.is_anonymous:
+        return models.Value(False, output_field=models.BooleanField())
+    return models.Exists(relations.filter(user_id=user.id, **lookups))
+
+
+class UserQuerySet(models.QuerySet):
+    def with_user_flags(self, user):
+        return self.annotate(is_subscribed=get_user_flag(
+            Subscribe.objects, user, author=models.OuterRef('pk')
+        ))
+
+
+class UserManager(DjangoUserManager.from_queryset(UserQuerySet)):
+    pass
+
+
+class User(CountersMixin, AbstractUser):
     password = models.CharField('пароль', max_length=150)
     username = models.CharField(
         'имя пользователя',
@@ -37,11 +57,17 @@ class User(AbstractUser):
             ),
         }
     )
+    recipes_count = CounterField('количество рецептов')
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username', 'first_name', 'last_name']
 
+    objects = UserManager()
+
     class Meta(AbstractUser.Meta):
         ordering = ('username',)
+        indexes = [
+            models.Index(fields=['username', 'id'], name='user_username_idx')
+        ]
 
     def __str__(self):
         return self.username